@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
-import joblib
-import os
+
+from model_registry import GENERAL_NAME, get_registry
+from predict_engine import get_engine
 
 # --- Custom CSS for Aqua Theme ---
 st.markdown("""
@@ -46,10 +46,9 @@ with st.container():
     st.markdown('</div>', unsafe_allow_html=True)
 
 # --- Model Selection ---
-models_dir = models_dir = "models"
-per_species_dir = os.path.join(models_dir, "per_species")
-per_length_dir = os.path.join(models_dir, "per_length")
-per_weight_dir = os.path.join(models_dir, "per_weight")
+models_dir = "models"
+registry = get_registry(models_dir)
+engine = get_engine(models_dir)
 
 with st.container():
     st.markdown('<div class="aqua-box">', unsafe_allow_html=True)
@@ -57,60 +56,44 @@ with st.container():
     model_type = st.selectbox("Model Type", ["General", "By Species", "By Length", "By Weight"])
 
     if model_type == "By Species":
-        species_models = [f for f in os.listdir(per_species_dir) if f.endswith(".pkl")]
-        species_names = [f.replace("fish_count_model_", "").replace(".pkl", "") for f in species_models]
-        species = st.selectbox("Select Species", species_names)
-        model_path = os.path.join(per_species_dir, f"fish_count_model_{species}.pkl")
+        group = "species"
+        species_names = registry.names(group)
+        model_name = st.selectbox("Select Species", species_names)
     elif model_type == "By Length":
-        length_labels = ["short", "medium", "long"]
-        length = st.selectbox("Select Length Category", length_labels)
-        model_path = os.path.join(per_length_dir, f"fish_count_model_length_{length}.pkl")
+        group = "length"
+        length_labels = registry.names(group)
+        model_name = st.selectbox("Select Length Category", length_labels)
     elif model_type == "By Weight":
-        weight_labels = ["light", "medium", "heavy"]
-        weight = st.selectbox("Select Weight Category", weight_labels)
-        model_path = os.path.join(per_weight_dir, f"fish_count_model_weight_{weight}.pkl")
+        group = "weight"
+        weight_labels = registry.names(group)
+        model_name = st.selectbox("Select Weight Category", weight_labels)
     else:
-        model_path = os.path.join(models_dir, "fish_count_model.pkl")
+        group = "general"
+        model_name = GENERAL_NAME
     st.markdown('</div>', unsafe_allow_html=True)
 
 # --- Prediction Button and Output ---
 with st.container():
     st.markdown('<div class="aqua-box">', unsafe_allow_html=True)
     if st.button("🐠 Predict Fish Count"):
-        model = joblib.load(model_path)
-        X = pd.DataFrame([[temperature, salinity]], columns=["Temperature (°C)", "Salinity (PSU)"])
-        prediction = model.predict(X)[0]
-        st.markdown(f"<h2 style='color:#0e7fa6;'>🐟 Estimated Fish Count: <b>{prediction:.2f}</b></h2>", unsafe_allow_html=True)
+        X = [temperature, salinity]
+        fit, conf, pred = (float(v[0]) for v in engine.predict_interval(group, model_name, X))
+        st.markdown(f"<h2 style='color:#0e7fa6;'>🐟 Estimated Fish Count: <b>{fit:.2f}</b></h2>", unsafe_allow_html=True)
+        if pred == pred:  # NaN for models trained without interval statistics
+            st.caption(f"95% prediction interval {fit - pred:.1f} – {fit + pred:.1f}; "
+                       f"mean count {fit - conf:.1f} – {fit + conf:.1f} (95% confidence)")
         st.balloons()
 
         # --- Comparison Graphs ---
-        st.markdown("### 📊 Comparison with All Categories")
-        compare_data = []
-        if model_type == "By Species":
-            for sp, fname in zip(species_names, species_models):
-                m = joblib.load(os.path.join(per_species_dir, fname))
-                pred = m.predict(X)[0]
-                compare_data.append({"Category": sp, "Predicted Count": pred})
-            df_compare = pd.DataFrame(compare_data)
-            st.bar_chart(df_compare.set_index("Category"))
-        elif model_type == "By Length":
-            for l in length_labels:
-                mpath = os.path.join(per_length_dir, f"fish_count_model_length_{l}.pkl")
-                if os.path.exists(mpath):
-                    m = joblib.load(mpath)
-                    pred = m.predict(X)[0]
-                    compare_data.append({"Category": l, "Predicted Count": pred})
-            df_compare = pd.DataFrame(compare_data)
-            st.bar_chart(df_compare.set_index("Category"))
-        elif model_type == "By Weight":
-            for w in weight_labels:
-                mpath = os.path.join(per_weight_dir, f"fish_count_model_weight_{w}.pkl")
-                if os.path.exists(mpath):
-                    m = joblib.load(mpath)
-                    pred = m.predict(X)[0]
-                    compare_data.append({"Category": w, "Predicted Count": pred})
-            df_compare = pd.DataFrame(compare_data)
-            st.bar_chart(df_compare.set_index("Category"))
+        if group != "general":
+            import altair as alt
+            st.markdown("### 📊 Comparison with All Categories")
+            df_compare = engine.compare(group, X, level=0.95)
+            base = alt.Chart(df_compare).encode(x=alt.X("Category:N", sort=None))
+            chart = (base.mark_bar(color="#0e7fa6").encode(y="Predicted Count:Q", tooltip=list(df_compare.columns))
+                     + base.mark_rule(color="#00334e").encode(y="Prediction Low:Q", y2="Prediction High:Q")
+                     + base.mark_rule(color="#f4a261", strokeWidth=6).encode(y="Confidence Low:Q", y2="Confidence High:Q"))
+            st.altair_chart(chart, width="stretch")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # --- Footer with Fish Graphics ---
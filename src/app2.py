@@ -1,11 +1,19 @@
+import contextlib
 import os
-import joblib
+import time
 import pandas as pd
 import numpy as np
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.cluster import KMeans
+
+from metrics import METRICS, SamplingProfiler
+from startup_profile import StartupReport
+
+# Heavy dependencies (matplotlib, seaborn, sklearn) and the dataset are
+# loaded inside the page that needs them, so e.g. the Threat Meter never
+# pays for them.
+report = StartupReport()
+# "Profile next rerun" (Metrics panel) samples the page render of one script run
+profiler = SamplingProfiler() if st.session_state.pop("profile_next_rerun", False) else None
 
 # ------------------ PAGE CONFIG ------------------
 st.set_page_config(
@@ -72,21 +80,56 @@ module = st.sidebar.radio("Modules", [
     "eDNA Analysis",
     "Threat Meter",
     "Fisheries Sustainability Index (FSI)",
-    "Heatmap (Temp vs Salinity)"
+    "Heatmap (Temp vs Salinity)",
+    "Live Sensor Stream"
 ])
 
 # ------------------ DATA ------------------
-BASE_DIR = r"C:\Users\aa\Desktop\Coding\sih-marine-prototype"
-DATA_PATH = os.path.join(BASE_DIR, "data", "fish_data.csv")
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# SAGAR_DATA_PATH (CSV or dataset store) and SAGAR_MODELS_DIR override the defaults, as for src/train_model.py
+DATA_PATH = os.environ.get("SAGAR_DATA_PATH", os.path.join(BASE_DIR, "data", "fish_data.csv"))
+STORE_PATH = DATA_PATH if os.path.isdir(DATA_PATH) else os.path.splitext(DATA_PATH)[0] + ".store"
+EDNA_PATH = os.path.join(BASE_DIR, "data", "edna_abundance.csv")  # written by src/edna.py
+LIVE_PATH = os.environ.get("SAGAR_LIVE_SNAPSHOT", os.path.join(BASE_DIR, "data", "live_snapshot.json"))  # written by src/live_stream.py
+models_dir = os.environ.get("SAGAR_MODELS_DIR", os.path.join(BASE_DIR, "models"))
+# Set SAGAR_SHARED to the name given to src/shared_data.py to attach to its published table and models
+SHARED_NAME = os.environ.get("SAGAR_SHARED")
 
-@st.cache_data
+@st.cache_resource
+def shared_worker(name):
+    from model_registry import install_registry
+    from shared_data import SharedWorker
+    worker = SharedWorker(name)
+    install_registry(models_dir, worker.registry(models_dir))
+    return worker
+
+if SHARED_NAME:
+    try:
+        shared_worker(SHARED_NAME).current()
+    except (FileNotFoundError, RuntimeError):  # no control segment, or nothing published into it yet
+        st.error(f"No shared data published under '{SHARED_NAME}'. Start `python src/shared_data.py "
+                 f"--name {SHARED_NAME}` first, or unset SAGAR_SHARED to read the files directly.")
+        st.stop()
+
+# cache_resource, not cache_data: the store-backed frame is memory-mapped and must not be copied per rerun
+@st.cache_resource
 def load_data(path):
+    from dataset_store import read_table
     if not os.path.exists(path):
         return None
-    return pd.read_csv(path)
+    return read_table(path)
 
-df = load_data(DATA_PATH)
-if df is None:
+def get_data(page):
+    """The observation table and its version (None for generated sample data)."""
+    from dataset_store import source_version
+    with report.measure(page, "load data"):
+        if SHARED_NAME:
+            snapshot = shared_worker(SHARED_NAME).current()  # zero-copy views, swapped when republished
+            return snapshot.frame, snapshot.data_version
+        data_source = STORE_PATH if os.path.isdir(STORE_PATH) else DATA_PATH
+        df = load_data(data_source)
+        if df is not None:
+            return df, source_version(data_source)
     st.warning("Dataset not found. Using generated sample data.")
     df = pd.DataFrame({
         "Temperature (°C)": np.random.uniform(24,30,200),
@@ -96,146 +139,319 @@ if df is None:
         "Weight (g)": np.random.uniform(50,5000,200),
         "Species": np.random.choice(["Species A","Species B","Species C"],200)
     })
+    return df, None
+
+@st.cache_resource(max_entries=4)
+def load_cube(_df, version):
+    from heatmap_cube import cached_cube
+    if os.path.isdir(STORE_PATH):
+        return cached_cube(_df, version, os.path.join(STORE_PATH, "heatmap_cube.npz"), STORE_PATH)
+    return cached_cube(_df, version)
+
+@st.cache_resource(max_entries=4)
+def load_summary(_df, version):
+    from summary_store import cached_summary
+    if os.path.isdir(STORE_PATH):
+        return cached_summary(_df, version, os.path.join(STORE_PATH, "summary.npz"), STORE_PATH)
+    return cached_summary(_df, version)
+
+@st.cache_resource(max_entries=4)
+def load_nearest(_df, version):
+    from observation_index import INDEX_FILE, cached_index
+    if os.path.isdir(STORE_PATH):
+        return cached_index(_df, version, os.path.join(STORE_PATH, INDEX_FILE), STORE_PATH)
+    return cached_index(_df, version)
 
-# ------------------ MODEL PATHS ------------------
-models_dir = os.path.join(BASE_DIR, "models")
-per_species_dir = os.path.join(models_dir, "per_species")
-per_length_dir = os.path.join(models_dir, "per_length")
-per_weight_dir = os.path.join(models_dir, "per_weight")
+@st.cache_resource(max_entries=4)
+def load_cluster_sweep(_df, version):
+    from biodiversity_clusters import ClusterCache
+    cache_dir = os.path.join(STORE_PATH, "clusters") if os.path.isdir(STORE_PATH) else None
+    return ClusterCache(cache_dir).sweep(_df, version, range(2, 7))
+
+def interval_chart(df_compare):
+    """Bars of the predicted counts with 95% prediction (thin) and confidence (thick) intervals."""
+    import altair as alt
+    base = alt.Chart(df_compare).encode(x=alt.X("Category:N", sort=None))
+    bars = base.mark_bar(color="#0077b6").encode(y="Predicted Count:Q", tooltip=list(df_compare.columns))
+    prediction = base.mark_rule(color="#003366").encode(y="Prediction Low:Q", y2="Prediction High:Q")
+    confidence = base.mark_rule(color="#f4a261", strokeWidth=6).encode(y="Confidence Low:Q", y2="Confidence High:Q")
+    return bars + prediction + confidence
 
 # ------------------ MODULES ------------------
-if module == "Fish Count":
+def fish_count_page(page):
+    with report.measure(page, "imports"):
+        from model_registry import GENERAL_NAME, get_registry
+        from prediction_table import SAL_GRID, TEMP_GRID, get_table
+    with report.measure(page, "load models"):
+        registry = get_registry(models_dir)
+
     st.header("🐟 Fish Count Prediction")
-    temp = st.slider("Temperature (°C)", 24.0, 30.0, 27.0, step=0.1)
-    sal = st.slider("Salinity (PSU)", 33.0, 37.0, 35.0, step=0.1)
+    temp = st.slider("Temperature (°C)", TEMP_GRID[0], TEMP_GRID[1], 27.0, step=TEMP_GRID[2])
+    sal = st.slider("Salinity (PSU)", SAL_GRID[0], SAL_GRID[1], 35.0, step=SAL_GRID[2])
 
     # Model Type selection (radio buttons)
     st.subheader("Select Prediction Model")
     model_type = st.radio("Model Type", ["General", "By Species", "By Length", "By Weight"])
 
     if model_type == "By Species":
-        species_models = [f for f in os.listdir(per_species_dir) if f.endswith(".pkl")]
-        species_names = [f.replace("fish_count_model_", "").replace(".pkl", "") for f in species_models]
-        species = st.radio("Select Species", species_names)
-        model_path = os.path.join(per_species_dir, f"fish_count_model_{species}.pkl")
-        st.info(f"Using model: {os.path.basename(model_path)}")
+        group = "species"
+        model_name = st.radio("Select Species", registry.names(group))
     elif model_type == "By Length":
-        length_labels = ["short", "medium", "long"]
-        length = st.radio("Select Length Category", length_labels)
-        model_path = os.path.join(per_length_dir, f"fish_count_model_length_{length}.pkl")
-        st.info(f"Using model: {os.path.basename(model_path)}")
+        group = "length"
+        model_name = st.radio("Select Length Category", registry.names(group))
     elif model_type == "By Weight":
-        weight_labels = ["light", "medium", "heavy"]
-        weight = st.radio("Select Weight Category", weight_labels)
-        model_path = os.path.join(per_weight_dir, f"fish_count_model_weight_{weight}.pkl")
-        st.info(f"Using model: {os.path.basename(model_path)}")
+        group = "weight"
+        model_name = st.radio("Select Weight Category", registry.names(group))
     else:
-        model_path = os.path.join(models_dir, "fish_count_model.pkl")
-        st.info(f"Using model: {os.path.basename(model_path)}")
+        group = "general"
+        model_name = GENERAL_NAME
+    if model_name not in registry.names(group):
+        st.error(f"No model found in {models_dir}")
+        return
+    model_path = registry.path(group, model_name)
+    st.info(f"Using model: {model_name} ({os.path.basename(model_path)})")
+    k = st.slider("Similar observations to show", 1, 20, 5)
 
     if st.button("Predict Fish Count"):
-        model = joblib.load(model_path)
-        X = pd.DataFrame([[temp, sal]], columns=["Temperature (°C)", "Salinity (PSU)"])
-        prediction = model.predict(X)[0]
+        # slider values sit on the precomputed grid, so these (intervals included) are array lookups
+        with report.measure(page, "prediction table"):
+            table = get_table(models_dir)
+        with report.measure(page, "predict"):
+            prediction = table.predict(group, model_name, temp, sal)
+            df_compare = table.compare(group, temp, sal, level=0.95)
+        bounds = df_compare.set_index("Category").loc[model_name]
         st.success(f"Predicted Fish Count: {prediction:.2f}")
+        if not np.isnan(bounds["Prediction Low"]):
+            st.caption(f"95% prediction interval {bounds['Prediction Low']:.1f} – {bounds['Prediction High']:.1f}; "
+                       f"mean count {bounds['Confidence Low']:.1f} – {bounds['Confidence High']:.1f} (95% confidence)")
 
         # Comparison Graphs
-        compare_data = []
-        if model_type == "By Species":
-            for sp, fname in zip(species_names, species_models):
-                m = joblib.load(os.path.join(per_species_dir, fname))
-                pred = m.predict(X)[0]
-                compare_data.append({"Category": sp, "Predicted Count": pred})
-        elif model_type == "By Length":
-            for l in length_labels:
-                mpath = os.path.join(per_length_dir, f"fish_count_model_length_{l}.pkl")
-                if os.path.exists(mpath):
-                    m = joblib.load(mpath)
-                    pred = m.predict(X)[0]
-                    compare_data.append({"Category": l, "Predicted Count": pred})
-        elif model_type == "By Weight":
-            for w in weight_labels:
-                mpath = os.path.join(per_weight_dir, f"fish_count_model_weight_{w}.pkl")
-                if os.path.exists(mpath):
-                    m = joblib.load(mpath)
-                    pred = m.predict(X)[0]
-                    compare_data.append({"Category": w, "Predicted Count": pred})
-        else:
-            compare_data.append({"Category": "General", "Predicted Count": prediction})
-        
-        df_compare = pd.DataFrame(compare_data)
-        st.bar_chart(df_compare.set_index("Category"))
-
-# ---------- Other modules remain unchanged ----------
-elif module == "Fish Size Classification":
+        st.altair_chart(interval_chart(df_compare), width="stretch")
+
+        # Nearest historical observations in (temperature, salinity)
+        df, data_version = get_data(page)
+        with report.measure(page, "nearest index"):
+            index = load_nearest(df, data_version)
+        with METRICS.span("nearest", module=page):
+            rows, dist = index.knn(temp, sal, k)
+            nearby = len(index.radius(temp, sal, 0.25)[0])
+        st.subheader("Most similar historical observations")
+        similar = df.iloc[rows][["Species", "Temperature (°C)", "Salinity (PSU)", "Fish Length (cm)", "Weight (g)", "Count"]]
+        st.dataframe(similar.assign(Distance=dist.round(3)).reset_index(drop=True))
+        st.caption(f"{nearby} of {len(index)} observations lie within 0.25 of ({temp:.1f} °C, {sal:.1f} PSU).")
+
+def size_classification_page(page):
+    with report.measure(page, "imports"):
+        from size_classifier import SIZE_LABELS, classify_rules, size_counts
     st.header("📏 Fish Size Classification")
     length = st.slider("Fish Length (cm)", 5.0, 100.0, 25.0, step=0.1)
     weight = st.slider("Fish Weight (g)", 50.0, 5000.0, 500.0, step=1.0)
-    if length<15 and weight<200:
-        size="Small"
-    elif length<40 and weight<1000:
-        size="Medium"
-    else:
-        size="Large"
+    size = SIZE_LABELS[classify_rules(length, weight)]
     st.success(f"Predicted Size: {size}")
+    st.subheader("Size classes in the dataset")
+    df, _ = get_data(page)
+    st.bar_chart(pd.Series(size_counts(df), name="Fish"))
 
-elif module == "Biodiversity Clustering":
+def clustering_page(page):
+    with report.measure(page, "imports"):
+        from biodiversity_clusters import ClusterCache
+        from figure_cache import FIGURES
     st.header("🧩 Biodiversity Clustering (KMeans)")
-    data = df[["Fish Length (cm)", "Weight (g)"]].sample(min(100,len(df)))
-    n_clusters = st.slider("Number of Clusters", 2, 6, 3, step=1)
-    km = KMeans(n_clusters=n_clusters, random_state=42).fit(data)
-    data["cluster"]=km.labels_
-    fig, ax = plt.subplots(figsize=(8,6))
-    sns.scatterplot(data=data, x="Fish Length (cm)", y="Weight (g)", hue="cluster", palette="tab10", s=100, ax=ax)
-    ax.set_title("KMeans Clusters")
-    st.pyplot(fig)
-
-elif module == "eDNA Analysis":
-    st.header("🧬 eDNA Analysis (Demo)")
-    taxa = df["Species"].value_counts()
-    st.bar_chart(taxa)
-
-elif module == "Threat Meter":
+    df, data_version = get_data(page)
+    with report.measure(page, "fit / lookup clusters"):
+        sweep = load_cluster_sweep(df, data_version) if data_version else ClusterCache().sweep(df, None)
+    ks = sorted(sweep.models)
+    if not ks:
+        st.warning("Not enough observations to cluster.")
+        return
+    n_clusters = st.slider("Number of Clusters", 2, ks[-1], min(3, ks[-1]), step=1) if len(ks) > 1 else ks[0]
+    data = sweep.labelled_sample(n_clusters)
+
+    def draw(fig, ax):
+        import seaborn as sns
+        sns.scatterplot(data=data, x="Fish Length (cm)", y="Weight (g)", hue="cluster", palette="tab10", s=100, ax=ax)
+        ax.set_title("KMeans Clusters")
+
+    with report.measure(page, "figure"):
+        key = ("clusters", data_version, n_clusters) if data_version else None
+        st.image(FIGURES.render(key, draw, figsize=(8,6)), width="stretch")
+    st.subheader("Elbow and silhouette by k")
+    diagnostics = sweep.diagnostics()
+    col1, col2 = st.columns(2)
+    col1.line_chart(diagnostics["inertia"])
+    col2.line_chart(diagnostics["silhouette"])
+
+@st.cache_data
+def load_edna(path, version):
+    return pd.read_csv(path)
+
+def edna_page(page):
+    if not os.path.exists(EDNA_PATH):
+        st.header("🧬 eDNA Analysis (Demo)")
+        st.caption("No eDNA abundance table yet: run src/edna.py on your reads to create data/edna_abundance.csv.")
+        df, data_version = get_data(page)
+        with report.measure(page, "aggregate"):
+            if data_version:
+                summary = load_summary(df, data_version)
+            else:
+                from summary_store import SummaryStore
+                summary = SummaryStore.from_frame(df)
+            taxa = summary.group_by("species", stats=["rows"])["rows"]
+        st.bar_chart(taxa)
+        return
+    with report.measure(page, "imports"):
+        from dataset_store import source_version
+    st.header("🧬 eDNA Analysis")
+    with report.measure(page, "load data"):
+        abundance = load_edna(EDNA_PATH, source_version(EDNA_PATH))
+    sample = st.selectbox("Sample", abundance["Sample"].unique())
+    table = abundance[abundance["Sample"] == sample].set_index("Taxon")
+    assigned = table.drop(index="Unassigned", errors="ignore")
+    col1, col2 = st.columns(2)
+    col1.metric("Reads", f"{int(table['Reads'].sum()):,}")
+    col2.metric("Assigned to a taxon", f"{assigned['Reads'].sum() / max(table['Reads'].sum(), 1):.1%}")
+    st.bar_chart(assigned["Reads"])
+    st.dataframe(table)
+
+def threat_page(page):
+    with report.measure(page, "imports"):
+        from scoring import THREAT
     st.header("⚠️ Threat Meter")
     temp_anom = st.slider("Temperature anomaly (°C)", -2.0, 5.0, 0.5, step=0.1)
     fishing = st.slider("Fishing pressure", 0.0, 100.0, 40.0, step=1.0)
     pollution = st.slider("Pollution index", 0.0, 100.0, 20.0, step=1.0)
-    score = max(0, min(100, temp_anom*12 + fishing*0.35 + pollution*0.2))
-    status = "Low 🟢" if score<40 else ("Moderate 🟡" if score<70 else "High 🟠")
-    st.metric("Threat Score", round(score,1), status)
+    score, code = THREAT.evaluate({"temp_anomaly": temp_anom, "fishing_pressure": fishing, "pollution_index": pollution})
+    st.metric("Threat Score", round(float(score),1), THREAT.labels[code])
 
-elif module == "Fisheries Sustainability Index (FSI)":
+def fsi_page(page):
+    with report.measure(page, "imports"):
+        from figure_cache import FIGURES
+        from scoring import FSI
     st.header("🌍 Fisheries Sustainability Index (FSI)")
-    labels = ['Biomass','Biodiversity','CPUE','Habitat','Governance']
+    labels = list(FSI.weights)
     values = [st.slider(l,0.0,100.0,50.0, step=1.0) for l in labels]
-    fsi = np.dot(values,[0.25,0.2,0.2,0.15,0.2])
-    status = "Sustainable ✅" if fsi>70 else ("Attention ⚠️" if fsi>50 else "Critical ❌")
-    st.metric("FSI Score", round(fsi,1), status)
+    fsi, code = FSI.evaluate(dict(zip(labels, values)))
+    st.metric("FSI Score", round(float(fsi),1), FSI.labels[code])
 
+    key = ("fsi", tuple(values))
     angles = np.linspace(0,2*np.pi,len(labels),endpoint=False).tolist()
     values += values[:1]
     angles += angles[:1]
-    fig = plt.figure(figsize=(6,6))
-    ax = fig.add_subplot(111, polar=True)
-    ax.plot(angles, values, 'o-', linewidth=2, color='#0077b6')
-    ax.fill(angles, values, alpha=0.25, color='#00b4d8')
-    ax.set_thetagrids(np.degrees(angles[:-1]), labels)
-    ax.set_ylim(0,100)
-    ax.set_title("FSI Radar")
-    st.pyplot(fig)
-
-elif module == "Heatmap (Temp vs Salinity)":
+
+    def draw(fig, ax):
+        ax.plot(angles, values, 'o-', linewidth=2, color='#0077b6')
+        ax.fill(angles, values, alpha=0.25, color='#00b4d8')
+        ax.set_thetagrids(np.degrees(angles[:-1]), labels)
+        ax.set_ylim(0,100)
+        ax.set_title("FSI Radar")
+
+    with report.measure(page, "figure"):
+        st.image(FIGURES.render(key, draw, figsize=(6,6), polar=True), width="stretch")
+
+def heatmap_page(page):
+    with report.measure(page, "imports"):
+        from figure_cache import FIGURES
+        from heatmap_cube import HeatmapCube
     st.header("🌡️ Heatmap: Temp vs Salinity")
-    df_heat = df.copy()
-    t_bins = np.round(np.linspace(df_heat["Temperature (°C)"].min(), df_heat["Temperature (°C)"].max(), 8),1)
-    s_bins = np.round(np.linspace(df_heat["Salinity (PSU)"].min(), df_heat["Salinity (PSU)"].max(), 8),1)
-    df_heat['t_bin'] = pd.cut(df_heat["Temperature (°C)"], bins=t_bins, include_lowest=True, labels=t_bins[:-1])
-    df_heat['s_bin'] = pd.cut(df_heat["Salinity (PSU)"], bins=s_bins, include_lowest=True, labels=s_bins[:-1])
-    pivot = df_heat.pivot_table(index='t_bin',columns='s_bin',values='Count',aggfunc='mean').fillna(0)
-
-    fig, ax = plt.subplots(figsize=(8,6))
-    sns.heatmap(pivot, annot=True, fmt=".1f", cmap="YlGnBu", cbar_kws={'label':'Mean Count'}, ax=ax)
-    ax.set_xlabel("Salinity bin")
-    ax.set_ylabel("Temperature bin")
-    ax.set_title("Mean Count Heatmap (Temp x Salinity)")
-    st.pyplot(fig)
+    df, data_version = get_data(page)
+    with report.measure(page, "aggregate"):
+        cube = load_cube(df, data_version) if data_version else HeatmapCube.from_frame(df)
+    n_bins = st.slider("Bins per axis", 3, 20, 7, step=1)
+    species = st.selectbox("Species", ["All species"] + cube.species)
+    with report.measure(page, "aggregate"):
+        pivot = cube.mean_table(n_bins, None if species == "All species" else species)
+    if pivot.empty:
+        st.info("No observations with temperature and salinity in range to map.")
+        return
+
+    def draw(fig, ax):
+        import seaborn as sns
+        sns.heatmap(pivot, annot=True, fmt=".1f", cmap="YlGnBu", cbar_kws={'label':'Mean Count'}, ax=ax)
+        ax.set_xlabel("Salinity bin")
+        ax.set_ylabel("Temperature bin")
+        ax.set_title("Mean Count Heatmap (Temp x Salinity)")
+
+    with report.measure(page, "figure"):
+        key = ("heatmap", data_version, n_bins, species) if data_version else None
+        st.image(FIGURES.render(key, draw, figsize=(8,6)), width="stretch")
+
+def live_page(page):
+    with report.measure(page, "imports"):
+        from live_stream import read_snapshot
+    st.header("📡 Live Sensor Stream")
+    group = st.selectbox("Model group", ["general", "species", "length", "weight"])
+
+    # only this block reruns on the timer; the rest of the page stays as it is
+    @st.fragment(run_every=2)
+    def panel():
+        snapshot = read_snapshot(LIVE_PATH)
+        if snapshot is None or not snapshot["window"]["readings"]:
+            st.info(f"No readings yet. Start the stream with `python src/live_stream.py --listen 127.0.0.1:8700`; "
+                    f"it writes {LIVE_PATH}.")
+            return
+        age = time.time() - snapshot["updated"]
+        if age > 10:
+            st.warning(f"Last update {age:.0f} s ago; is the stream still running?")
+        window = snapshot["window"]
+        rate = f", {window['rate_per_s']:.1f} readings/s" if window["rate_per_s"] else ""
+        st.caption(f"{window['readings']} readings in the window over {window['seconds']:.0f} s{rate}; "
+                   f"{snapshot['received']} received, {snapshot['dropped']} dropped, {snapshot['rejected']} unparseable")
+        temp, sal = snapshot["stats"]["temperature"], snapshot["stats"]["salinity"]
+        col1, col2 = st.columns(2)
+        col1.metric("Temperature (°C)", f"{temp['last']:.2f}", f"{temp['last'] - temp['mean']:+.2f} vs window mean")
+        col2.metric("Salinity (PSU)", f"{sal['last']:.2f}", f"{sal['last'] - sal['mean']:+.2f} vs window mean")
+        st.dataframe(pd.DataFrame(snapshot["stats"]).T.round(3))
+        recent = pd.DataFrame(snapshot["recent"])
+        recent.index = pd.to_datetime(recent.pop("ts"), unit="s")
+        st.line_chart(recent)
+        predictions = snapshot["predictions"].get(group, {})
+        st.subheader("Predicted fish count")
+        st.dataframe(pd.DataFrame(predictions).T.rename(columns={"last": "Latest reading", "mean": "Window mean"}).round(2))
+
+    panel()
+
+PAGES = {
+    "Fish Count": fish_count_page,
+    "Fish Size Classification": size_classification_page,
+    "Biodiversity Clustering": clustering_page,
+    "eDNA Analysis": edna_page,
+    "Threat Meter": threat_page,
+    "Fisheries Sustainability Index (FSI)": fsi_page,
+    "Heatmap (Temp vs Salinity)": heatmap_page,
+    "Live Sensor Stream": live_page,
+}
+
+METRICS.inc("reruns_total", module=module)
+# the context manager stops the sampling thread even when the page raises, st.stop()s or reruns
+with profiler or contextlib.nullcontext(), report.measure(module, "render"):
+    PAGES[module](module)
+
+# ------------------ STARTUP REPORT ------------------
+with st.sidebar.expander("⏱️ Startup timings"):
+    st.caption(f"This rerun: {report.timings[(module, 'render')] * 1000:.1f} ms")
+    st.dataframe(report.table(), hide_index=True)
+
+# ------------------ METRICS ------------------
+# Set SAGAR_METRICS_DIR to also write a Prometheus textfile, a JSON line per rerun and profiles
+METRICS_DIR = os.environ.get("SAGAR_METRICS_DIR")
+if METRICS_DIR:
+    METRICS.log_json(os.path.join(METRICS_DIR, "dashboard_metrics.jsonl"), module=module,
+                     profiled=profiler is not None)
+    METRICS.write_textfile(os.path.join(METRICS_DIR, "dashboard.prom"))
+else:
+    METRICS.drain_events()
+
+with st.sidebar.expander("📈 Metrics"):
+    if st.button("Profile next rerun"):
+        st.session_state["profile_next_rerun"] = True
+        st.rerun()
+    st.dataframe(pd.DataFrame(METRICS.summary()), hide_index=True)
+    st.download_button("Prometheus metrics", METRICS.prometheus_text(), "dashboard.prom", "text/plain")
+
+if profiler is not None:
+    with st.expander(f"🔬 Sampling profile of this rerun ({profiler.samples} samples)", expanded=True):
+        st.dataframe(pd.DataFrame(profiler.top(25)), hide_index=True)
+        st.download_button("Collapsed stacks (flamegraph)", profiler.collapsed(), "profile.folded", "text/plain")
+    if METRICS_DIR:
+        with open(os.path.join(METRICS_DIR, f"profile_{int(time.time())}.folded"), "w", encoding="utf-8") as f:
+            f.write(profiler.collapsed())
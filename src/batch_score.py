@@ -0,0 +1,138 @@
+"""Score large survey files against every count model.
+
+The input (CSV or Parquet) is streamed in fixed-size chunks, each chunk is
+predicted with one matmul against the stacked coefficients of all selected
+model groups and written out before the next one is read, so memory use
+does not depend on the input size.
+
+    python src/batch_score.py cruise_log.csv scored.csv --chunk-size 200000 --jobs 4
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from model_registry import MODEL_GROUPS
+from predict_engine import FEATURES, StackedModels, get_engine
+
+DEFAULT_MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+
+def stack_groups(engine, groups):
+    """Stack the models of several groups into one ``StackedModels`` with ``pred_<group>_<name>`` columns."""
+    names, weights = [], []
+    for group in groups:
+        stacked = engine.stack(group)
+        names += [f"pred_{group}" if group == "general" else f"pred_{group}_{name}" for name in stacked.names]
+        weights.append(stacked.weights)
+    return StackedModels(names, np.vstack(weights))
+
+
+def read_chunks(path, chunk_size, columns=None):
+    """Yield DataFrames of at most ``chunk_size`` rows from a CSV or Parquet file."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet = path.endswith(".parquet")
+        self._writer = None
+        self.rows = 0
+
+    def write(self, frame):
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_chunk(stacked, chunk, predictions_only=False):
+    preds = pd.DataFrame(stacked.predict(chunk), columns=stacked.names, index=chunk.index)
+    if predictions_only:
+        return preds
+    return pd.concat([chunk, preds], axis=1)
+
+
+# ------------------ PROCESS POOL ------------------
+_worker_stack = None
+
+
+def _init_worker(names, weights):
+    global _worker_stack
+    _worker_stack = StackedModels(names, weights)
+
+
+def _score_in_worker(chunk, predictions_only):
+    return score_chunk(_worker_stack, chunk, predictions_only)
+
+
+def score_file(input_path, output_path, models_dir=DEFAULT_MODELS_DIR, groups=tuple(MODEL_GROUPS),
+               chunk_size=100_000, jobs=1, predictions_only=False):
+    """Score ``input_path`` into ``output_path``; returns the number of rows written."""
+    stacked = stack_groups(get_engine(models_dir), groups)
+    columns = FEATURES if predictions_only else None
+    writer = ChunkWriter(output_path)
+    try:
+        if jobs <= 1:
+            for chunk in read_chunks(input_path, chunk_size, columns):
+                writer.write(score_chunk(stacked, chunk, predictions_only))
+        else:
+            # keep at most two chunks per worker in flight so memory stays bounded
+            with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(stacked.names, stacked.weights)) as pool:
+                pending = deque()
+                for chunk in read_chunks(input_path, chunk_size, columns):
+                    pending.append(pool.submit(_score_in_worker, chunk, predictions_only))
+                    if len(pending) >= 2 * jobs:
+                        writer.write(pending.popleft().result())
+                while pending:
+                    writer.write(pending.popleft().result())
+    finally:
+        writer.close()
+    return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a survey file against the fish count models.")
+    parser.add_argument("input", help="CSV or .parquet file with Temperature (°C) and Salinity (PSU) columns")
+    parser.add_argument("output", help="CSV or .parquet file to write")
+    parser.add_argument("--models-dir", default=DEFAULT_MODELS_DIR)
+    parser.add_argument("--groups", nargs="+", choices=list(MODEL_GROUPS), default=list(MODEL_GROUPS))
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes (1 = score in this process)")
+    parser.add_argument("--predictions-only", action="store_true", help="do not copy the input columns")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = score_file(args.input, args.output, args.models_dir, args.groups,
+                      args.chunk_size, args.jobs, args.predictions_only)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s): {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
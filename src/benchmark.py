@@ -0,0 +1,252 @@
+"""Reproducible benchmarks for the training, prediction, heatmap and clustering paths.
+
+Synthetic survey data with the ``fish_data.csv`` schema is generated from
+a fixed seed and written once per size into a dataset store, so every
+benchmark reads the same memory-mapped table the dashboard does. Each
+benchmark runs once under ``tracemalloc`` for its peak memory (this also
+warms caches) and then at least ``--repeat`` times, and until it has run
+for ``--min-time`` seconds, for timing. Throughput, latency
+percentiles and peak memory go to a JSON results file. With
+``--baseline`` a run is compared against a stored results file and exits
+non-zero when any benchmark got slower than the tolerance allows.
+
+    python src/benchmark.py --sizes 1e3 1e4 1e5 1e6 --output benchmarks/results.json
+    python src/benchmark.py --sizes 1e3 1e4 1e5 --save-baseline benchmarks/baseline.json
+    python src/benchmark.py --sizes 1e3 1e4 1e5 --baseline benchmarks/baseline.json
+    python src/benchmark.py --sizes 1e8 --only train predict_batch --work-dir /data/bench
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+from biodiversity_clusters import fit_k
+from heatmap_cube import HeatmapCube
+from predict_engine import get_engine
+from train_model import train
+
+# length range (cm) per species; weight follows a length-weight curve
+SPECIES = {
+    "Anchovy": (5.0, 20.0),
+    "Sardine": (10.0, 25.0),
+    "Pomfret": (15.0, 35.0),
+    "Mackerel": (20.0, 45.0),
+    "Tuna": (40.0, 100.0),
+}
+GENERATE_CHUNK = 1_000_000
+PREDICT_BLOCK = 1_000_000
+SINGLE_ROW_CALLS = 1000
+
+
+# ------------------ SYNTHETIC DATA ------------------
+def synthetic_frame(n, rng):
+    """``n`` observations with the survey schema, rounded to the survey's 0.1 precision."""
+    names = list(SPECIES)
+    species = rng.integers(0, len(names), n)
+    lo, hi = np.array(list(SPECIES.values())).T
+    length = lo[species] + rng.random(n) * (hi - lo)[species]
+    weight = np.clip(0.0105 * length ** 3 * rng.lognormal(0.0, 0.15, n), 50.0, 5000.0)
+    return pd.DataFrame({
+        "Temperature (°C)": np.round(rng.uniform(24.0, 30.0, n), 1),
+        "Salinity (PSU)": np.round(rng.uniform(33.0, 37.0, n), 1),
+        "Fish Length (cm)": np.round(length, 1),
+        "Weight (g)": np.round(weight, 1),
+        "Count": rng.integers(1, 100, n),
+        "Species": np.asarray(names, dtype=object)[species],
+    })
+
+
+def synthetic_store(work_dir, rows, seed=0):
+    """Dataset store with ``rows`` synthetic observations, reused when it already exists."""
+    store_dir = os.path.join(work_dir, f"synthetic_{rows}_seed{seed}.store")
+    if os.path.isdir(store_dir):
+        if dataset_store.read_manifest(store_dir)["rows"] == rows:
+            return store_dir
+        shutil.rmtree(store_dir)
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, GENERATE_CHUNK):
+        dataset_store.append(store_dir, synthetic_frame(min(GENERATE_CHUNK, rows - start), rng))
+    return store_dir
+
+
+# ------------------ BENCHMARKS ------------------
+# Each benchmark gets the store directory and its loaded table, runs the
+# measured path once and returns (rows processed, per-call latencies in s).
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _models_dir(store_dir):
+    return store_dir[:-len(".store")] + "_models"
+
+
+def bench_train(store_dir, df):
+    # force: the build cache would otherwise skip the fit on every repeat (and on a reused --work-dir)
+    with contextlib.redirect_stdout(io.StringIO()):  # train() reports every saved model
+        _, elapsed = _timed(train, store_dir, _models_dir(store_dir), 1, True)
+    return len(df), [elapsed]
+
+
+def bench_predict_batch(store_dir, df):
+    engine = get_engine(_models_dir(store_dir))
+    latencies = []
+    for start in range(0, len(df), PREDICT_BLOCK):
+        block = df.iloc[start:start + PREDICT_BLOCK]
+        for group in ("general", "species", "length", "weight"):
+            latencies.append(_timed(engine.predict_all, group, block)[1])
+    return 4 * len(df), latencies
+
+
+def bench_predict_row(store_dir, df):
+    engine = get_engine(_models_dir(store_dir))
+    name = engine.stack("species").names[0]
+    rows = df[["Temperature (°C)", "Salinity (PSU)"]].iloc[:SINGLE_ROW_CALLS].to_numpy(dtype=np.float64)
+    latencies = [_timed(engine.predict, "species", name, row)[1] for row in rows]
+    return len(rows), latencies
+
+
+def bench_heatmap(store_dir, df):
+    cube, build = _timed(HeatmapCube.from_frame, df)
+    _, table = _timed(cube.mean_table, 7)
+    return len(df), [build + table]
+
+
+def bench_kmeans(store_dir, df):
+    _, elapsed = _timed(fit_k, df, 3, 4096, 1)
+    return len(df), [elapsed]
+
+
+# predict benchmarks need the models written by train, so order matters
+BENCHMARKS = {
+    "train": bench_train,
+    "predict_batch": bench_predict_batch,
+    "predict_row": bench_predict_row,
+    "heatmap": bench_heatmap,
+    "kmeans": bench_kmeans,
+}
+
+
+def run_benchmark(name, store_dir, df, repeat=3, min_time=0.5):
+    fn = BENCHMARKS[name]
+    tracemalloc.start()
+    try:
+        fn(store_dir, df)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    totals, latencies = [], []
+    while len(totals) < repeat or sum(totals) < min_time:
+        rows, run_latencies = fn(store_dir, df)
+        totals.append(sum(run_latencies))
+        latencies += run_latencies
+    seconds = float(np.median(totals))
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    return {
+        "benchmark": name,
+        "rows": len(df),
+        "processed": rows,
+        "repeat": len(totals),
+        "seconds": round(seconds, 6),
+        "throughput_rows_s": round(rows / seconds, 1) if seconds > 0 else None,
+        "latency_ms": {"p50": round(p50, 4), "p90": round(p90, 4), "p99": round(p99, 4),
+                       "max": round(max(latencies) * 1000, 4)},
+        "peak_memory_mb": round(peak / 2 ** 20, 3),
+    }
+
+
+def run_suite(sizes, names=None, repeat=3, work_dir=None, seed=0, min_time=0.5):
+    names = list(BENCHMARKS) if not names else [n for n in BENCHMARKS if n in names]
+    if any(n.startswith("predict") for n in names) and "train" not in names:
+        names.insert(0, "train")  # the predict paths need trained models
+    own_dir = work_dir is None
+    work_dir = tempfile.mkdtemp(prefix="fish_bench_") if own_dir else work_dir
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    try:
+        for rows in sizes:
+            store_dir = synthetic_store(work_dir, rows, seed)
+            df = dataset_store.load(store_dir)
+            for name in names:
+                result = run_benchmark(name, store_dir, df, repeat, min_time)
+                results.append(result)
+                print(f"✅ {name:<14} {rows:>11,} rows  {result['throughput_rows_s'] or 0:>14,.0f} rows/s  "
+                      f"p99 {result['latency_ms']['p99']:.3f} ms  peak {result['peak_memory_mb']:.1f} MB")
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "numpy": np.__version__, "pandas": pd.__version__, "cpus": os.cpu_count()},
+        "config": {"sizes": list(sizes), "repeat": repeat, "min_time": min_time, "seed": seed},
+        "results": results,
+    }
+
+
+# ------------------ BASELINE ------------------
+def compare(report, baseline, tolerance=0.25):
+    """Messages for every benchmark whose throughput fell more than ``tolerance`` below the baseline."""
+    expected = {(r["benchmark"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        base = expected.get((result["benchmark"], result["rows"]))
+        if base is None or not base["throughput_rows_s"] or not result["throughput_rows_s"]:
+            continue
+        ratio = result["throughput_rows_s"] / base["throughput_rows_s"]
+        if ratio < 1 - tolerance:
+            regressions.append(f"{result['benchmark']} @ {result['rows']:,} rows: "
+                               f"{result['throughput_rows_s']:,.0f} rows/s vs baseline "
+                               f"{base['throughput_rows_s']:,.0f} ({(1 - ratio) * 100:.0f}% slower)")
+    return regressions
+
+
+def write_json(report, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark training, prediction, heatmap and clustering.")
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1e3, 1e4, 1e5, 1e6],
+                        help="row counts to generate, e.g. 1e3 1e6 1e8")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.5, help="keep repeating until this many seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="keep the synthetic stores here between runs")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results.json"))
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed throughput drop against the baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also store this run as the baseline")
+    args = parser.parse_args()
+
+    report = run_suite([int(n) for n in args.sizes], args.only, args.repeat, args.work_dir, args.seed,
+                       args.min_time)
+    write_json(report, args.output)
+    print(f"✅ Results written to {args.output}")
+    if args.save_baseline:
+        write_json(report, args.save_baseline)
+        print(f"✅ Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            raise SystemExit("❌ Performance regression against " + args.baseline + ":\n  "
+                             + "\n  ".join(regressions))
+        print(f"✅ No benchmark more than {args.tolerance:.0%} slower than {args.baseline}")
@@ -0,0 +1,138 @@
+"""Mini-batch k-means over the full observation table.
+
+Every k of a sweep is fitted with ``MiniBatchKMeans.partial_fit`` over
+fixed-size batches of the whole dataset (so memory stays bounded and the
+result is deterministic), the ks run in parallel worker processes (the
+partial_fit loop is Python-level, so threads would serialise on the GIL;
+the feature array is memory-mapped into the workers rather than copied),
+and the elbow (inertia) and silhouette diagnostics share one distance
+matrix over a fixed sample. ks that the data cannot support (k >= number
+of rows) are left out of a sweep. Fitted sweeps are cached per (data
+version, k) in memory and on disk, so moving the k slider is a lookup.
+"""
+import argparse
+import json
+import os
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import pairwise_distances, silhouette_score
+
+from dataset_store import read_table, source_version
+
+FEATURES = ["Fish Length (cm)", "Weight (g)"]
+
+
+def _batch(df, start, stop):
+    if isinstance(df, np.ndarray):
+        return df[start:stop]
+    return df.iloc[start:stop][FEATURES].to_numpy(dtype=np.float64)
+
+
+def fit_k(df, k, batch_size=4096, n_epochs=3, random_state=42):
+    """Fit one k by streaming mini-batches; returns the model and its full-data inertia.
+
+    ``df`` is the observation table or its ``FEATURES`` columns as a float64 array.
+    """
+    if not 1 <= k <= len(df):
+        raise ValueError(f"Cannot fit {k} clusters to {len(df)} rows")
+    model = MiniBatchKMeans(n_clusters=k, batch_size=batch_size, random_state=random_state, n_init=3)
+    rng = np.random.default_rng(random_state)
+    starts = np.arange(0, len(df), batch_size)
+    # the first partial_fit initialises the centres, so give it at least k rows
+    first = _batch(df, 0, max(batch_size, 3 * k))
+    model.partial_fit(first)
+    for _ in range(n_epochs):
+        for start in rng.permutation(starts):
+            batch = _batch(df, start, start + batch_size)
+            if len(batch):
+                model.partial_fit(batch)
+    inertia = sum(-model.score(_batch(df, start, start + batch_size)) for start in starts)
+    return model, float(inertia)
+
+
+def sample_rows(df, size, random_state=42):
+    """A fixed, seeded sample of the feature rows (same rows for every k and rerun)."""
+    if len(df) <= size:
+        return df[FEATURES].to_numpy(dtype=np.float64)
+    idx = np.sort(np.random.default_rng(random_state).choice(len(df), size, replace=False))
+    return df.iloc[idx][FEATURES].to_numpy(dtype=np.float64)
+
+
+class ClusterSweep:
+    """Fitted models and diagnostics for a range of k on one data version."""
+
+    def __init__(self, version, models, inertia, silhouette, sample):
+        self.version = version
+        self.models = models
+        self.inertia = inertia
+        self.silhouette = silhouette
+        self.sample = sample
+
+    def labelled_sample(self, k):
+        data = pd.DataFrame(self.sample, columns=FEATURES)
+        data["cluster"] = self.models[k].predict(self.sample)
+        return data
+
+    def diagnostics(self):
+        ks = sorted(self.models)
+        return pd.DataFrame({"inertia": [self.inertia[k] for k in ks],
+                             "silhouette": [self.silhouette[k] for k in ks]}, index=pd.Index(ks, name="k"))
+
+
+class ClusterCache:
+    """Sweeps keyed by (data version, k), kept in memory and optionally under ``cache_dir``."""
+
+    def __init__(self, cache_dir=None, sample_size=2000, n_jobs=-1):
+        self.cache_dir = cache_dir
+        self.sample_size = sample_size
+        self.n_jobs = n_jobs
+        self._lock = threading.Lock()
+        self._fits = {}  # (version, k) -> (model, inertia, silhouette)
+
+    def _path(self, version, k):
+        return os.path.join(self.cache_dir, f"kmeans_{version}_k{k}.pkl")
+
+    def _lookup(self, version, k):
+        fit = self._fits.get((version, k))
+        if fit is None and self.cache_dir and version and os.path.exists(self._path(version, k)):
+            fit = self._fits[(version, k)] = joblib.load(self._path(version, k))
+        return fit
+
+    def sweep(self, df, version, ks=range(2, 7)):
+        """Return a ``ClusterSweep`` for ``ks``, fitting only the ks not cached for ``version``."""
+        ks = [k for k in ks if 2 <= k < len(df)]  # silhouette needs 2 <= clusters <= rows - 1
+        sample = sample_rows(df, self.sample_size)
+        with self._lock:
+            missing = [k for k in ks if self._lookup(version, k) is None]
+            if missing:
+                X = df[FEATURES].to_numpy(dtype=np.float64)
+                fitted = Parallel(n_jobs=self.n_jobs, prefer="processes")(delayed(fit_k)(X, k) for k in missing)
+                # one distance matrix for every k's silhouette
+                distances = pairwise_distances(sample)
+                for k, (model, inertia) in zip(missing, fitted):
+                    labels = model.predict(sample)
+                    score = silhouette_score(distances, labels, metric="precomputed") \
+                        if 1 < len(np.unique(labels)) < len(sample) else float("nan")
+                    self._fits[(version, k)] = (model, inertia, float(score))
+                    if self.cache_dir and version:
+                        os.makedirs(self.cache_dir, exist_ok=True)
+                        joblib.dump(self._fits[(version, k)], self._path(version, k))
+            fits = {k: self._lookup(version, k) for k in ks}
+        return ClusterSweep(version, {k: f[0] for k, f in fits.items()}, {k: f[1] for k, f in fits.items()},
+                            {k: f[2] for k, f in fits.items()}, sample)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit and cache the biodiversity clustering sweep.")
+    parser.add_argument("data", help="observation CSV or dataset store directory")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--max-k", type=int, default=6)
+    args = parser.parse_args()
+    sweep = ClusterCache(args.cache_dir).sweep(read_table(args.data, FEATURES), source_version(args.data),
+                                               range(2, args.max_k + 1))
+    print(json.dumps(sweep.diagnostics().reset_index().to_dict(orient="records"), indent=2))
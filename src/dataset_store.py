@@ -0,0 +1,202 @@
+"""Typed, memory-mapped columnar store for the observation table.
+
+A store is a directory with one raw little-endian binary file per column
+and a ``manifest.json`` describing dtypes, row count and the categories of
+string columns. Column dtypes come from ``COLUMN_DTYPES``, not from the
+first chunk written: measures are float32, counts int32 and ``Species``
+(and any other string column) is stored as int16 category codes. Other
+numeric columns are float32. Appending values that do not fit a column
+(text in a numeric column, fractions or missing values in an integer
+column) raises instead of truncating. Columns are opened
+with ``np.memmap`` so reading is zero-copy and only the requested columns
+are touched.
+
+    python src/dataset_store.py data/fish_data.csv data/fish_data.store
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+CODE_DTYPE = np.dtype("<i2")
+# (rows, version) entries kept in the manifest; a derived cache older than that rebuilds in full
+HISTORY_LIMIT = 1000
+# declared column dtypes; None = categorical
+COLUMN_DTYPES = {
+    "Temperature (°C)": np.dtype("<f4"),
+    "Salinity (PSU)": np.dtype("<f4"),
+    "Fish Length (cm)": np.dtype("<f4"),
+    "Weight (g)": np.dtype("<f4"),
+    "Count": np.dtype("<i4"),
+    "Species": None,
+}
+
+
+def _slug(name):
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
+def _column_dtype(name, series):
+    if name in COLUMN_DTYPES:
+        return COLUMN_DTYPES[name]
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return np.dtype("<f4")  # never integer by inference: a later chunk may hold fractions
+    return None  # categorical
+
+
+def _cast(name, series, dtype):
+    """``series`` as ``dtype``, or ValueError if that would lose or invent values."""
+    if isinstance(series.dtype, pd.CategoricalDtype) or not (
+            pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)):
+        numeric = pd.to_numeric(series, errors="coerce")
+        if (numeric.isna() & series.notna()).any():
+            raise ValueError(f"Column {name!r} holds non-numeric values")
+        series = numeric
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    if dtype.kind == "i":
+        info = np.iinfo(dtype)
+        if np.isnan(values).any():
+            raise ValueError(f"Column {name!r} is {dtype} and cannot hold missing values")
+        if (values != np.round(values)).any() or (values < info.min).any() or (values > info.max).any():
+            raise ValueError(f"Column {name!r} is {dtype}; appended values are not whole numbers in range")
+    return values.astype(dtype)
+
+
+def read_manifest(store_dir):
+    with open(os.path.join(store_dir, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(store_dir, manifest):
+    tmp = os.path.join(store_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, os.path.join(store_dir, MANIFEST))
+
+
+def append(store_dir, df):
+    """Append the rows of ``df`` to the store, creating it on first use.
+
+    New category values are added to the end of the category list so
+    existing codes never change.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, MANIFEST)
+    if os.path.exists(path):
+        manifest = read_manifest(store_dir)
+    else:
+        manifest = {"format": FORMAT_VERSION, "rows": 0, "version": "", "columns": {}}
+        for name in df.columns:
+            dtype = _column_dtype(name, df[name])
+            manifest["columns"][name] = {
+                "file": _slug(name) + ".bin",
+                "dtype": (dtype or CODE_DTYPE).str,
+                "categories": None if dtype is not None else [],
+            }
+    missing = set(manifest["columns"]) - set(df.columns)
+    if missing:
+        raise ValueError(f"Rows to append are missing columns: {sorted(missing)}")
+
+    digest = hashlib.sha1(manifest["version"].encode())
+    for name, col in manifest["columns"].items():
+        dtype = np.dtype(col["dtype"])
+        if col["categories"] is None:
+            values = _cast(name, df[name], dtype)
+        else:
+            categories = col["categories"]
+            new = pd.Index(pd.unique(df[name].astype(str))).difference(categories)
+            categories.extend(new.tolist())
+            if len(categories) > np.iinfo(dtype).max:
+                raise ValueError(f"Too many categories in column {name!r}")
+            values = pd.Categorical(df[name].astype(str), categories=categories).codes.astype(dtype)
+        data = np.ascontiguousarray(values).tobytes()
+        digest.update(data)
+        with open(os.path.join(store_dir, col["file"]), "ab") as f:
+            f.write(data)
+    manifest["rows"] += len(df)
+    manifest["version"] = digest.hexdigest()
+    # (rows, version) after every append, so derived tables can catch up incrementally
+    history = manifest.setdefault("history", [])
+    history.append([manifest["rows"], manifest["version"]])
+    del history[:-HISTORY_LIMIT]
+    _write_manifest(store_dir, manifest)
+    return manifest
+
+
+def convert(csv_path, store_dir, chunk_size=1_000_000):
+    """Build a store from a CSV file, streaming it in chunks."""
+    if os.path.exists(os.path.join(store_dir, MANIFEST)):
+        raise FileExistsError(f"{store_dir} already holds a dataset store")
+    manifest = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        manifest = append(store_dir, chunk)
+    return manifest
+
+
+def open_columns(store_dir, columns=None):
+    """Read-only memory maps of the raw column arrays (category columns as codes)."""
+    manifest = read_manifest(store_dir)
+    columns = list(manifest["columns"]) if columns is None else columns
+    arrays = {}
+    for name in columns:
+        col = manifest["columns"][name]
+        dtype = np.dtype(col["dtype"])
+        if manifest["rows"] == 0:
+            arrays[name] = np.empty(0, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(os.path.join(store_dir, col["file"]), dtype=dtype, mode="r",
+                                     shape=(manifest["rows"],))
+    return arrays
+
+
+def load(store_dir, columns=None):
+    """The store as a DataFrame backed by the memory maps; string columns become categoricals."""
+    manifest = read_manifest(store_dir)
+    data = {}
+    for name, values in open_columns(store_dir, columns).items():
+        categories = manifest["columns"][name]["categories"]
+        data[name] = values if categories is None else pd.Categorical.from_codes(values, categories)
+    return pd.DataFrame(data, copy=False)
+
+
+def version(store_dir):
+    return read_manifest(store_dir)["version"]
+
+
+def rows_at_version(store_dir, version):
+    """How many rows the store held when it had ``version``, or None if it never did."""
+    for rows, seen in read_manifest(store_dir).get("history", []):
+        if seen == version:
+            return rows
+    return None
+
+
+def source_version(path):
+    """Version of a store, or size/mtime of a plain file, for cache keys."""
+    if os.path.isdir(path):
+        return version(path)
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def read_table(path, columns=None):
+    """Load observations from a store directory, or from a CSV file as a fallback."""
+    if os.path.isdir(path):
+        return load(path, columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert an observation CSV into a columnar dataset store.")
+    parser.add_argument("csv")
+    parser.add_argument("store_dir")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+    manifest = convert(args.csv, args.store_dir, args.chunk_size)
+    print(f"✅ Stored {manifest['rows']} rows, {len(manifest['columns'])} columns in {args.store_dir}")
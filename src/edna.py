@@ -0,0 +1,278 @@
+"""eDNA read profiling: streaming k-mer matching against a local reference.
+
+Sequence files (FASTA or FASTQ, optionally gzipped) are read in batches of
+at most ``batch_bases`` bases. Each batch is encoded two bits per base
+into a NumPy array, every read's canonical k-mers (the smaller of a k-mer
+and its reverse complement, packed into a uint64) are looked up in the
+reference index, and the read is assigned to the taxon with the most
+k-mer hits if it clearly beats the runner-up. Batches are processed by a
+pool of worker processes with a bounded number of batches in flight, so
+memory does not depend on the file size.
+
+The reference is a FASTA file whose headers start with the taxon name
+(``>Tuna COI barcode``); a taxon may have several sequences. Only k-mers
+found in exactly one taxon are kept in the index.
+
+    python src/edna.py reference.fasta station1.fastq.gz station2.fasta --jobs 4
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_K = 21
+UNASSIGNED = "Unassigned"
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "edna_abundance.csv")
+
+# A/C/G/T (either case) -> 0..3, anything else (N, IUPAC codes) -> 4
+_CODES = np.full(256, 4, dtype=np.uint8)
+for _i, _base in enumerate(b"ACGT"):
+    _CODES[_base] = _CODES[_base + 32] = _i
+
+
+# ------------------ READING ------------------
+def _open(path):
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    return gzip.open(path, "rb") if gzipped else open(path, "rb")
+
+
+def read_records(path):
+    """Yield (header, sequence) pairs from a FASTA or FASTQ file, one record at a time."""
+    with _open(path) as f:
+        first = f.readline()
+        if not first:
+            return
+        if first.startswith(b"@"):  # FASTQ: header, sequence, '+', qualities
+            header = first
+            while header:
+                seq = f.readline().rstrip()
+                f.readline()
+                f.readline()
+                yield header[1:].rstrip().decode(), seq
+                header = f.readline()
+        elif first.startswith(b">"):
+            header, parts = first, []
+            for line in f:
+                if line.startswith(b">"):
+                    yield header[1:].rstrip().decode(), b"".join(parts)
+                    header, parts = line, []
+                else:
+                    parts.append(line.rstrip())
+            yield header[1:].rstrip().decode(), b"".join(parts)
+        else:
+            raise ValueError(f"{path} is neither FASTA nor FASTQ")
+
+
+def read_batches(path, batch_bases=2_000_000):
+    """Yield (concatenated bases, read lengths) batches of about ``batch_bases`` bases."""
+    seqs, lengths, size = [], [], 0
+    for _, seq in read_records(path):
+        seqs.append(seq)
+        lengths.append(len(seq))
+        size += len(seq)
+        if size >= batch_bases:
+            yield b"".join(seqs), np.array(lengths, dtype=np.int64)
+            seqs, lengths, size = [], [], 0
+    if seqs:
+        yield b"".join(seqs), np.array(lengths, dtype=np.int64)
+
+
+# ------------------ ENCODING ------------------
+def encode(bases):
+    """2-bit base codes (0..3) as uint8, with 4 marking N and other ambiguous bases."""
+    return _CODES[np.frombuffer(bases, dtype=np.uint8)]
+
+
+def canonical_kmers(codes, lengths, k=DEFAULT_K):
+    """Canonical k-mers of every read and the read each one belongs to.
+
+    ``codes`` holds the reads back to back with ``lengths`` bases each;
+    windows crossing a read boundary or containing an N are skipped.
+    """
+    if not 0 < k <= 32:
+        raise ValueError("k must be between 1 and 32")
+    n = len(codes) - k + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    read = np.repeat(np.arange(len(lengths)), lengths)
+    invalid = np.concatenate([[0], np.cumsum(codes > 3)])
+    valid = (read[:n] == read[k - 1:]) & (invalid[k:] == invalid[:n])
+    base = codes.astype(np.uint64) & np.uint64(3)
+    forward = np.zeros(n, dtype=np.uint64)
+    reverse = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        window = base[j:j + n]
+        forward <<= np.uint64(2)
+        forward |= window
+        reverse |= (np.uint64(3) - window) << np.uint64(2 * j)
+    return np.minimum(forward, reverse)[valid], read[:n][valid]
+
+
+# ------------------ REFERENCE ------------------
+class ReferenceIndex:
+    """Sorted diagnostic k-mers of the reference taxa and the taxon of each."""
+
+    def __init__(self, kmers, taxon_ids, taxa, k):
+        self.kmers = np.asarray(kmers, dtype=np.uint64)
+        self.taxon_ids = np.asarray(taxon_ids, dtype=np.int32)
+        self.taxa = list(taxa)
+        self.k = int(k)
+
+    @classmethod
+    def from_fasta(cls, path, k=DEFAULT_K):
+        taxa, kmers, ids = [], [], []
+        for header, seq in read_records(path):
+            taxon = header.split()[0] if header.split() else header
+            if taxon not in taxa:
+                taxa.append(taxon)
+            found, _ = canonical_kmers(encode(seq), [len(seq)], k)
+            kmers.append(np.unique(found))
+            ids.append(np.full(len(kmers[-1]), taxa.index(taxon), dtype=np.int32))
+        pairs = np.unique(np.column_stack([np.concatenate(kmers or [np.empty(0, np.uint64)]),
+                                           np.concatenate(ids or [np.empty(0, np.int32)]).astype(np.uint64)]),
+                          axis=0)
+        # keep only k-mers that point at a single taxon
+        unique, counts = np.unique(pairs[:, 0], return_counts=True)
+        diagnostic = np.isin(pairs[:, 0], unique[counts == 1])
+        return cls(pairs[diagnostic, 0], pairs[diagnostic, 1], taxa, k)
+
+    def lookup(self, kmers):
+        """Taxon id per k-mer, -1 where the k-mer is not diagnostic for any taxon."""
+        pos = np.searchsorted(self.kmers, kmers)
+        pos = np.minimum(pos, max(len(self.kmers) - 1, 0))
+        hit = self.kmers[pos] == kmers if len(self.kmers) else np.zeros(len(kmers), dtype=bool)
+        return np.where(hit, self.taxon_ids[pos] if len(self.kmers) else -1, -1)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, kmers=self.kmers, taxon_ids=self.taxon_ids, taxa=np.array(self.taxa, dtype=str), k=self.k)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["kmers"], saved["taxon_ids"], saved["taxa"].tolist(), int(saved["k"]))
+
+
+# ------------------ ASSIGNMENT ------------------
+def assign_batch(index, bases, lengths, min_hits=2):
+    """Per-taxon read and k-mer hit counts for one batch.
+
+    Returns (reads per taxon, k-mer hits per taxon), each with one extra
+    last slot: unassigned reads and k-mers without a diagnostic hit.
+    """
+    n_taxa = len(index.taxa)
+    kmers, read = canonical_kmers(encode(bases), lengths, index.k)
+    taxon = index.lookup(kmers)
+    hit = taxon >= 0
+    kmer_hits = np.bincount(np.where(hit, taxon, n_taxa), minlength=n_taxa + 1)
+    # hits per (read, taxon), then the best and runner-up taxon of every read
+    keys, counts = np.unique(read[hit] * n_taxa + taxon[hit], return_counts=True)
+    reads_of, taxa_of = keys // n_taxa, keys % n_taxa
+    order = np.lexsort((-counts, reads_of))
+    reads_of, taxa_of, counts = reads_of[order], taxa_of[order], counts[order]
+    first = np.flatnonzero(np.r_[True, reads_of[1:] != reads_of[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+    runner_up = np.zeros(len(first), dtype=counts.dtype)
+    has_second = first + 1 < len(reads_of)
+    has_second[has_second] = reads_of[first[has_second] + 1] == reads_of[first[has_second]]
+    runner_up[has_second] = counts[first[has_second] + 1]
+    confident = (counts[first] >= min_hits) & (counts[first] > runner_up)
+    assigned = np.bincount(taxa_of[first][confident], minlength=n_taxa)
+    reads = np.append(assigned, len(lengths) - assigned.sum())
+    return reads, kmer_hits
+
+
+def _init_worker(kmers, taxon_ids, taxa, k):
+    global _worker_index
+    _worker_index = ReferenceIndex(kmers, taxon_ids, taxa, k)
+
+
+def _assign_in_worker(bases, lengths, min_hits):
+    return assign_batch(_worker_index, bases, lengths, min_hits)
+
+
+def profile_sample(path, index, jobs=1, batch_bases=2_000_000, min_hits=2):
+    """Abundance table of one sequence file: reads and k-mer hits per taxon."""
+    reads = np.zeros(len(index.taxa) + 1, dtype=np.int64)
+    kmer_hits = np.zeros(len(index.taxa) + 1, dtype=np.int64)
+
+    def add(result):
+        reads[:] += result[0]
+        kmer_hits[:] += result[1]
+
+    if jobs <= 1:
+        for bases, lengths in read_batches(path, batch_bases):
+            add(assign_batch(index, bases, lengths, min_hits))
+    else:
+        # keep at most two batches per worker in flight so memory stays bounded
+        initargs = (index.kmers, index.taxon_ids, index.taxa, index.k)
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=initargs) as pool:
+            pending = deque()
+            for bases, lengths in read_batches(path, batch_bases):
+                pending.append(pool.submit(_assign_in_worker, bases, lengths, min_hits))
+                if len(pending) >= 2 * jobs:
+                    add(pending.popleft().result())
+            while pending:
+                add(pending.popleft().result())
+    total = max(reads.sum(), 1)
+    return pd.DataFrame({
+        "Taxon": index.taxa + [UNASSIGNED],
+        "Reads": reads,
+        "Relative Abundance": reads / total,
+        "K-mer Hits": kmer_hits,
+    })
+
+
+def abundance_table(samples, index, jobs=1, batch_bases=2_000_000, min_hits=2):
+    """Long table (Sample, Taxon, Reads, Relative Abundance, K-mer Hits) for ``{sample: path}``."""
+    frames = [profile_sample(path, index, jobs, batch_bases, min_hits).assign(Sample=name)
+              for name, path in samples.items()]
+    table = pd.concat(frames, ignore_index=True)
+    return table[["Sample", "Taxon", "Reads", "Relative Abundance", "K-mer Hits"]]
+
+
+def _sample_name(path):
+    name = os.path.basename(path)
+    for ext in (".gz", ".fastq", ".fq", ".fasta", ".fa", ".fna"):
+        if name.lower().endswith(ext):
+            name = name[:-len(ext)]
+    return name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Assign eDNA reads to reference taxa and tabulate abundances.")
+    parser.add_argument("reference", help="reference FASTA (taxon name first in each header) or a saved .npz index")
+    parser.add_argument("samples", nargs="+", help="FASTA/FASTQ files, optionally gzipped; one sample each")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("-k", type=int, default=DEFAULT_K)
+    parser.add_argument("--min-hits", type=int, default=2, help="diagnostic k-mer hits needed to assign a read")
+    parser.add_argument("--batch-bases", type=int, default=2_000_000)
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes (1 = run in this process)")
+    parser.add_argument("--save-index", help="also save the reference index as .npz")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.reference.endswith(".npz"):
+        index = ReferenceIndex.load(args.reference)
+    else:
+        index = ReferenceIndex.from_fasta(args.reference, args.k)
+    if args.save_index:
+        index.save(args.save_index)
+    samples = {_sample_name(path): path for path in args.samples}
+    table = abundance_table(samples, index, args.jobs, args.batch_bases, args.min_hits)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    table.to_csv(args.output, index=False)
+    reads = int(table["Reads"].sum())
+    elapsed = time.perf_counter() - start
+    print(f"✅ {reads:,} reads from {len(samples)} sample(s) against {len(index.taxa)} taxa "
+          f"in {elapsed:.1f}s: {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
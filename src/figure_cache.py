@@ -0,0 +1,98 @@
+"""Rendered-figure cache for the matplotlib dashboard modules.
+
+``FIGURES.render(key, draw)`` returns PNG bytes for a chart. The bytes are
+kept in an LRU bounded by total size, keyed by the module inputs and the
+data version, so a cache hit never touches matplotlib. On a miss the
+chart is drawn on a ``matplotlib.figure.Figure`` that is not registered
+with pyplot (so nothing accumulates in pyplot's figure manager). Figures
+are checked out of a small pool per size, so later misses reuse them
+across reruns (Streamlit runs every rerun on a new thread) while no two
+renders ever draw on the same figure; each is cleared before it goes
+back.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+from metrics import METRICS
+
+DPI = 200  # what st.pyplot renders at
+POOL_SIZE = 2  # idle figures kept per figure size
+
+
+class FigureCache:
+    def __init__(self, max_bytes=32 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._images = OrderedDict()  # key -> PNG bytes
+        self._pool = {}  # figsize -> idle figures; one render owns a figure at a time
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _checkout(self, figsize):
+        from matplotlib.figure import Figure
+
+        with self._lock:
+            idle = self._pool.get(figsize)
+            if idle:
+                return idle.pop()
+        return Figure(figsize=figsize)
+
+    def _checkin(self, figsize, fig):
+        with self._lock:
+            idle = self._pool.setdefault(figsize, [])
+            if len(idle) < POOL_SIZE:
+                idle.append(fig)
+
+    def render(self, key, draw, figsize=(8, 6), polar=False, dpi=DPI):
+        """PNG bytes of the chart ``draw(fig, ax)`` produces, cached under ``key``.
+
+        ``key`` must capture everything the chart depends on (inputs and
+        data version); pass ``None`` to render without caching.
+        """
+        if key is not None:
+            with self._lock:
+                png = self._images.get(key)
+                if png is not None:
+                    self._images.move_to_end(key)
+                    self.hits += 1
+                    METRICS.inc("figure_cache_total", result="hit")
+                    return png
+        with self._lock:
+            self.misses += 1
+        METRICS.inc("figure_cache_total", result="miss")
+        figsize = tuple(figsize)
+        fig = self._checkout(figsize)
+        try:
+            draw(fig, fig.add_subplot(111, polar=polar))
+            buf = io.BytesIO()
+            fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+        finally:
+            fig.clear()  # drops axes, artists and colorbars but keeps the figure and its canvas
+            self._checkin(figsize, fig)
+        png = buf.getvalue()
+        if key is not None and len(png) <= self.max_bytes:
+            with self._lock:
+                if key not in self._images:
+                    self._images[key] = png
+                    self.bytes += len(png)
+                while self.bytes > self.max_bytes:
+                    _, old = self._images.popitem(last=False)
+                    self.bytes -= len(old)
+                    self.evictions += 1
+        return png
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"images": len(self._images), "bytes": self.bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+FIGURES = FigureCache()
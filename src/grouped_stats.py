@@ -0,0 +1,195 @@
+"""Per-group sufficient statistics for the fish count regressions.
+
+Every count model is an ordinary least squares fit of ``Count`` on
+(Temperature, Salinity). The fit only needs XᵀX, Xᵀy and n of its rows
+(with X = [1, Temperature, Salinity]), so all groups of a grouping are
+accumulated together with ``np.bincount`` in one pass over the data and
+each model is then solved from its 3x3 system.
+
+The statistics are additive, so they are stored per model where its
+``.pkl`` used to live (``<model>.stats.npz``) and new survey rows can be
+folded in without revisiting the history.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from model_registry import GENERAL_NAME, LENGTH_LABELS, MODEL_GROUPS, WEIGHT_LABELS, model_path
+from predict_engine import FEATURES
+
+TARGET = "Count"
+LENGTH_BINS = [0, 20, 40, float("inf")]
+WEIGHT_BINS = [0, 500, 2000, float("inf")]
+N_TERMS = len(FEATURES) + 1
+GROUPS = ("general", "species", "length", "weight")
+STATS_SUFFIX = ".stats.npz"
+
+
+def stats_path(models_dir, group, name):
+    return model_path(models_dir, group, name)[:-len(".pkl")] + STATS_SUFFIX
+
+
+def group_codes(df, group):
+    """Integer group code per row (-1 = row belongs to no group) and the group names."""
+    if group == "general":
+        return np.zeros(len(df), dtype=np.intp), [GENERAL_NAME]
+    if group == "species":
+        codes, names = pd.factorize(df["Species"], sort=True)
+        return codes, list(names)
+    if group == "length":
+        cats = pd.cut(df["Fish Length (cm)"], bins=LENGTH_BINS, labels=LENGTH_LABELS, right=False)
+        return cats.cat.codes.to_numpy(), LENGTH_LABELS
+    if group == "weight":
+        cats = pd.cut(df["Weight (g)"], bins=WEIGHT_BINS, labels=WEIGHT_LABELS, right=False)
+        return cats.cat.codes.to_numpy(), WEIGHT_LABELS
+    raise ValueError(f"Unknown model group: {group}")
+
+
+class SufficientStats:
+    """XᵀX, Xᵀy, yᵀy and n for a set of named groups."""
+
+    def __init__(self, names, xtx=None, xty=None, yty=None, n=None):
+        g = len(names)
+        self.names = list(names)
+        self.xtx = np.zeros((g, N_TERMS, N_TERMS)) if xtx is None else np.asarray(xtx, dtype=np.float64)
+        self.xty = np.zeros((g, N_TERMS)) if xty is None else np.asarray(xty, dtype=np.float64)
+        self.yty = np.zeros(g) if yty is None else np.asarray(yty, dtype=np.float64)
+        self.n = np.zeros(g, dtype=np.int64) if n is None else np.asarray(n, dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, X, y, codes, names):
+        keep = codes >= 0
+        if not keep.all():
+            X, y, codes = X[keep], y[keep], codes[keep]
+        g = len(names)
+        terms = [np.ones(len(y))] + [X[:, j] for j in range(X.shape[1])]
+        stats = cls(names)
+        stats.n = np.bincount(codes, minlength=g).astype(np.int64)
+        for i in range(N_TERMS):
+            stats.xty[:, i] = np.bincount(codes, weights=terms[i] * y, minlength=g)
+            for j in range(i, N_TERMS):
+                stats.xtx[:, i, j] = stats.xtx[:, j, i] = np.bincount(codes, weights=terms[i] * terms[j], minlength=g)
+        stats.yty = np.bincount(codes, weights=y * y, minlength=g)
+        return stats
+
+    def merge(self, other):
+        """Combined statistics of both row sets; groups are matched by name."""
+        names = self.names + [name for name in other.names if name not in self.names]
+        merged = SufficientStats(names)
+        for part in (self, other):
+            idx = [names.index(name) for name in part.names]
+            merged.xtx[idx] += part.xtx
+            merged.xty[idx] += part.xty
+            merged.yty[idx] += part.yty
+            merged.n[idx] += part.n
+        return merged
+
+    def select(self, names):
+        idx = [self.names.index(name) for name in names]
+        return SufficientStats(names, self.xtx[idx], self.xty[idx], self.yty[idx], self.n[idx])
+
+    def save(self, models_dir, group):
+        """Write one ``.stats.npz`` per non-empty group next to its model file."""
+        for k, name in enumerate(self.names):
+            if self.n[k] == 0:
+                continue
+            path = stats_path(models_dir, group, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                np.savez(f, xtx=self.xtx[k], xty=self.xty[k], yty=self.yty[k], n=self.n[k])
+
+    @classmethod
+    def load(cls, models_dir, group):
+        """Statistics stored for every model of ``group`` (empty if none were saved)."""
+        sub_dir, prefix = MODEL_GROUPS[group]
+        if group == "general":
+            paths = {GENERAL_NAME: stats_path(models_dir, group, GENERAL_NAME)}
+        else:
+            group_dir = os.path.join(models_dir, sub_dir)
+            fnames = os.listdir(group_dir) if os.path.isdir(group_dir) else []
+            paths = {f[len(prefix):-len(STATS_SUFFIX)]: os.path.join(group_dir, f)
+                     for f in sorted(fnames) if f.startswith(prefix) and f.endswith(STATS_SUFFIX)}
+        paths = {name: path for name, path in paths.items() if os.path.isfile(path)}
+        stats = cls(paths)
+        for k, path in enumerate(paths.values()):
+            with np.load(path) as saved:
+                stats.xtx[k], stats.xty[k] = saved["xtx"], saved["xty"]
+                stats.yty[k], stats.n[k] = saved["yty"], saved["n"]
+        return stats
+
+    def solve(self):
+        """OLS weights per group as ``(n_groups, 3)``: intercept then feature coefficients.
+
+        Solved on the centred system, as ``LinearRegression`` does, so the
+        result matches a direct fit on the group's rows.
+        """
+        n = np.maximum(self.n, 1).astype(np.float64)
+        x_mean = self.xtx[:, 0, 1:] / n[:, None]
+        y_mean = self.xty[:, 0] / n
+        cov = self.xtx[:, 1:, 1:] - n[:, None, None] * x_mean[:, :, None] * x_mean[:, None, :]
+        cxy = self.xty[:, 1:] - n[:, None] * x_mean * y_mean[:, None]
+        weights = np.zeros((len(self.names), N_TERMS))
+        for k in range(len(self.names)):
+            try:
+                coef = np.linalg.solve(cov[k], cxy[k])
+            except np.linalg.LinAlgError:
+                coef = np.linalg.lstsq(cov[k], cxy[k], rcond=None)[0]
+            weights[k, 1:] = coef
+            weights[k, 0] = y_mean[k] - x_mean[k] @ coef
+        return weights
+
+    def uncertainty(self):
+        """Residual variance, residual degrees of freedom and (XᵀX)⁻¹ per group.
+
+        Rows of ``(n_groups, 2 + 3 * 3)``: σ² = SSE / (n - 3), n - 3, then
+        the flattened inverse, which is all a confidence or prediction
+        interval of the fit needs. σ² is NaN for groups with fewer than four
+        rows. SSE comes from the centred system, as in ``solve``.
+        """
+        weights = self.solve()
+        n = np.maximum(self.n, 1).astype(np.float64)
+        x_mean = self.xtx[:, 0, 1:] / n[:, None]
+        y_mean = self.xty[:, 0] / n
+        cxy = self.xty[:, 1:] - n[:, None] * x_mean * y_mean[:, None]
+        syy = self.yty - n * y_mean ** 2
+        sse = np.clip(syy - (weights[:, 1:] * cxy).sum(axis=1), 0, None)
+        dof = self.n - N_TERMS
+        rows = np.empty((len(self.names), 2 + N_TERMS * N_TERMS))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rows[:, 0] = np.where(dof > 0, sse / dof, np.nan)
+        rows[:, 1] = dof
+        rows[:, 2:] = np.linalg.pinv(self.xtx).reshape(len(self.names), -1)
+        return rows
+
+    def to_models(self):
+        """Fitted ``LinearRegression`` per non-empty group, equivalent to calling ``fit`` on its rows."""
+        weights = self.solve()
+        models = {}
+        for k, name in enumerate(self.names):
+            if self.n[k] == 0:
+                continue
+            n = self.n[k]
+            x_mean = self.xtx[k, 0, 1:] / n
+            cov = self.xtx[k, 1:, 1:] - n * np.outer(x_mean, x_mean)
+            model = LinearRegression()
+            model.coef_ = weights[k, 1:].copy()
+            model.intercept_ = float(weights[k, 0])
+            model.n_features_in_ = len(FEATURES)
+            model.feature_names_in_ = np.array(FEATURES, dtype=object)
+            model.rank_ = int(np.linalg.matrix_rank(cov))
+            model.singular_ = np.sqrt(np.clip(np.linalg.eigvalsh(cov)[::-1], 0, None))
+            models[name] = model
+        return models
+
+
+def compute_group_stats(df, groups=GROUPS):
+    """``SufficientStats`` for each grouping, one vectorised pass per grouping."""
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = df[TARGET].to_numpy(dtype=np.float64)
+    stats = {}
+    for group in groups:
+        codes, names = group_codes(df, group)
+        stats[group] = SufficientStats.from_arrays(X, y, codes, names)
+    return stats
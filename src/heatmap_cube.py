@@ -0,0 +1,198 @@
+"""Pre-aggregated Temperature x Salinity cube for the heatmap page.
+
+Observations are snapped once onto a fine base grid (0.1 °C x 0.1 PSU by
+default, the precision of the survey data) holding the Count sum and row
+count per cell, optionally split by species. The grid is built with a
+vectorised ``np.bincount`` pass, grows when appended rows fall outside
+it, and any coarser heatmap is derived from the cells alone, so serving
+the page never touches the raw rows. Points outside the plausible ranges
+of ``ingest.SCHEMA`` (sentinels such as -999) are left out, so a bad
+reading cannot blow the dense grid up.
+
+``cached_cube`` catches a saved cube up with only the rows appended to a
+dataset store, like ``summary_store.cached_summary``.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+from ingest import SCHEMA
+
+TEMP = "Temperature (°C)"
+SAL = "Salinity (PSU)"
+COUNT = "Count"
+LIMITS = np.array([SCHEMA[TEMP][1:], SCHEMA[SAL][1:]])  # (lowest, highest) per axis
+
+
+class HeatmapCube:
+    def __init__(self, resolution=(0.1, 0.1), by_species=True):
+        self.resolution = np.asarray(resolution, dtype=np.float64)
+        self.by_species = by_species
+        self.origin = None  # grid point of cell (0, 0)
+        self.species = []
+        self.sums = np.zeros((1, 0, 0))  # (1 + n_species, n_temp, n_sal); layer 0 = all species
+        self.counts = np.zeros((1, 0, 0), dtype=np.int64)
+        self.lo = np.array([np.inf, np.inf])  # observed data range
+        self.hi = np.array([-np.inf, -np.inf])
+        self.n_rows = 0  # source rows seen, including rows left out
+        self.version = None
+
+    @classmethod
+    def from_frame(cls, df, version=None, **kwargs):
+        cube = cls(**kwargs)
+        cube.update(df)
+        cube.version = version
+        return cube
+
+    # ------------------ BUILD / UPDATE ------------------
+    def _cells(self, values):
+        return np.rint((values - self.origin) / self.resolution).astype(np.int64)
+
+    def _grow(self, lo, hi):
+        new_origin = np.rint(lo / self.resolution) * self.resolution
+        if self.origin is not None:
+            new_origin = np.minimum(new_origin, self.origin)
+        top = np.rint((hi - new_origin) / self.resolution).astype(np.int64) + 1
+        if self.origin is not None:
+            shift = np.rint((self.origin - new_origin) / self.resolution).astype(np.int64)
+            top = np.maximum(top, shift + self.counts.shape[1:])
+        else:
+            shift = np.zeros(2, dtype=np.int64)
+        if self.origin is not None and not shift.any() and (top == self.counts.shape[1:]).all():
+            return
+        sums = np.zeros((self.sums.shape[0], *top))
+        counts = np.zeros((self.counts.shape[0], *top), dtype=np.int64)
+        t0, s0 = shift
+        nt, ns = self.counts.shape[1:]
+        sums[:, t0:t0 + nt, s0:s0 + ns] = self.sums
+        counts[:, t0:t0 + nt, s0:s0 + ns] = self.counts
+        self.origin, self.sums, self.counts = new_origin, sums, counts
+
+    def update(self, df):
+        """Fold new observations into the cube."""
+        points = df[[TEMP, SAL]].to_numpy(dtype=np.float64)
+        self.n_rows += len(points)
+        with np.errstate(invalid="ignore"):
+            valid = ((points >= LIMITS[:, 0]) & (points <= LIMITS[:, 1])).all(axis=1)
+        points = points[valid]
+        if len(points) == 0:
+            return self
+        values = df[COUNT].to_numpy(dtype=np.float64)[valid]
+        self.lo = np.minimum(self.lo, points.min(axis=0))
+        self.hi = np.maximum(self.hi, points.max(axis=0))
+        self._grow(points.min(axis=0), points.max(axis=0))
+
+        layers = np.zeros(len(points), dtype=np.int64)
+        if self.by_species:
+            species = df["Species"].astype(str).to_numpy()[valid]
+            new = [s for s in pd.unique(species) if s not in self.species]
+            if new:
+                self.species += sorted(new)
+                pad = len(new)
+                self.sums = np.concatenate([self.sums, np.zeros((pad, *self.sums.shape[1:]))])
+                self.counts = np.concatenate([self.counts, np.zeros((pad, *self.counts.shape[1:]), dtype=np.int64)])
+            layers = pd.Index(self.species).get_indexer(species) + 1
+
+        cells = self._cells(points)
+        n_layers, nt, ns = self.counts.shape
+        flat = (layers * nt + cells[:, 0]) * ns + cells[:, 1]
+        size = n_layers * nt * ns
+        self.sums += np.bincount(flat, weights=values, minlength=size).reshape(self.sums.shape)
+        self.counts += np.bincount(flat, minlength=size).reshape(self.counts.shape)
+        if self.by_species:
+            # layer 0 is the all-species total
+            self.sums[0] = self.sums[1:].sum(axis=0)
+            self.counts[0] = self.counts[1:].sum(axis=0)
+        return self
+
+    # ------------------ QUERIES ------------------
+    def _layer(self, species):
+        if species is None:
+            return self.sums[0], self.counts[0]
+        k = self.species.index(species) + 1
+        return self.sums[k], self.counts[k]
+
+    @staticmethod
+    def _assign(edges, points):
+        """One-hot (n_bins x n_cells) matrix assigning each base cell to a coarse bin.
+
+        Bins are right-closed with the lowest edge included, as in ``pd.cut``.
+        """
+        n_bins = len(edges) - 1
+        tol = 1e-9
+        idx = np.clip(np.searchsorted(edges, points - tol, side="left") - 1, 0, n_bins - 1)
+        inside = (points >= edges[0] - tol) & (points <= edges[-1] + tol)
+        onehot = np.zeros((n_bins, len(points)))
+        onehot[idx[inside], np.nonzero(inside)[0]] = 1.0
+        return onehot
+
+    def mean_table(self, n_bins=7, species=None):
+        """Mean Count per coarse (temperature bin, salinity bin), labelled by rounded lower edges.
+
+        Bins span the observed data range evenly like the original
+        ``pd.cut`` heatmap; cost depends only on the number of cells. A cube
+        no rows have been added to gives an empty table.
+        """
+        if self.origin is None:
+            return pd.DataFrame(index=pd.Index([], name="t_bin", dtype=float),
+                                columns=pd.Index([], name="s_bin", dtype=float), dtype=float)
+        sums, counts = self._layer(species)
+        t_edges = np.round(np.linspace(self.lo[0], self.hi[0], n_bins + 1), 1)
+        s_edges = np.round(np.linspace(self.lo[1], self.hi[1], n_bins + 1), 1)
+        t_points = self.origin[0] + np.arange(sums.shape[0]) * self.resolution[0]
+        s_points = self.origin[1] + np.arange(sums.shape[1]) * self.resolution[1]
+        at = self._assign(t_edges, t_points)
+        as_ = self._assign(s_edges, s_points)
+        total = at @ sums @ as_.T
+        n = at @ counts @ as_.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, total / n, 0.0)
+        return pd.DataFrame(mean, index=pd.Index(t_edges[:-1], name="t_bin"),
+                            columns=pd.Index(s_edges[:-1], name="s_bin"))
+
+    # ------------------ PERSISTENCE ------------------
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            origin = np.full(2, np.nan) if self.origin is None else self.origin  # None would need pickling
+            np.savez(f, resolution=self.resolution, by_species=self.by_species, origin=origin,
+                     species=np.array(self.species, dtype=str), sums=self.sums, counts=self.counts,
+                     lo=self.lo, hi=self.hi, n_rows=self.n_rows, version=str(self.version or ""))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            cube = cls(saved["resolution"], bool(saved["by_species"]))
+            cube.origin = None if np.isnan(saved["origin"]).any() else saved["origin"]
+            cube.species = saved["species"].tolist()
+            cube.sums, cube.counts = saved["sums"], saved["counts"]
+            cube.lo, cube.hi = saved["lo"], saved["hi"]
+            cube.n_rows = int(saved["n_rows"]) if "n_rows" in saved else None
+            cube.version = str(saved["version"]) or None
+        return cube
+
+
+def cached_cube(df, version, path=None, store_dir=None):
+    """The cube saved at ``path`` brought up to ``version``.
+
+    When ``df`` is a dataset store that has only grown since the cube was
+    saved, just the appended rows are folded in; otherwise the cube is
+    rebuilt from ``df``.
+    """
+    cube = HeatmapCube.load(path) if path and version and os.path.exists(path) else None
+    if cube is not None and cube.version == version:
+        return cube
+    if cube is not None and store_dir and cube.version:
+        start = dataset_store.rows_at_version(store_dir, cube.version)
+        if start is not None and start == cube.n_rows:
+            cube.update(df.iloc[start:])
+            cube.version = version
+            cube.save(path)
+            return cube
+    cube = HeatmapCube.from_frame(df, version=version)
+    if path and version:
+        cube.save(path)
+    return cube
@@ -0,0 +1,307 @@
+"""Ingest a directory of per-vessel observation CSVs into one dataset store.
+
+Every file is parsed and validated in a worker process: the columns are
+checked against ``SCHEMA``, values are coerced to numbers in one
+vectorised pass per column, and rows with missing, non-numeric,
+non-integer or out-of-range values are split off with the reason. Valid
+rows are downcast (float32 measures, int32 counts, categorical species)
+and appended to the dataset store in file order. Rejected rows, and files
+that could not be read at all, go to a CSV report; neither stops the
+batch.
+
+The store's ledger records, per file, how many bytes and lines were
+ingested and a hash of the bytes just before that offset, so the command
+can be rerun as files arrive and grow: unchanged files are skipped, a
+file that was appended to is read from where the last run stopped, and a
+file whose ingested part was rewritten is reported in the rejects rather
+than appended a second time. Only lines ending in a newline are read; a
+last line still being written waits for a later run.
+
+    python src/ingest.py incoming/ data/fish_data.store --jobs 8
+"""
+import argparse
+import fnmatch
+import hashlib
+import io
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+
+# column -> (kind, lowest, highest); bounds are inclusive
+SCHEMA = {
+    "Temperature (°C)": ("float", -2.0, 40.0),
+    "Salinity (PSU)": ("float", 0.0, 45.0),
+    "Fish Length (cm)": ("float", 0.1, 500.0),
+    "Weight (g)": ("float", 0.1, 1_000_000.0),
+    "Count": ("int", 0, 1_000_000),
+    "Species": ("category", None, None),
+}
+LEDGER = "ingested.json"
+TAIL_BYTES = 4096  # bytes before the ingested offset that must be unchanged for a file to be continued
+REJECT_COLUMNS = ["file", "line", "reason"] + list(SCHEMA)
+
+
+def _rejects(frame):
+    return frame.reindex(columns=REJECT_COLUMNS)
+
+
+def validate(raw, source="", first_line=2):
+    """Split a parsed frame into downcast valid rows and rejected rows with reasons.
+
+    Numeric columns the parser already typed are used as they are; only
+    columns holding some text go through ``pd.to_numeric``.
+
+    ``line`` in the rejects is the line number in the source file, with
+    the first row of ``raw`` on ``first_line`` (blank and malformed lines,
+    which the parser drops, are not counted).
+    """
+    raw = raw.rename(columns=lambda c: str(c).strip())
+    missing = [c for c in SCHEMA if c not in raw.columns]
+    if missing:
+        raise ValueError(f"missing columns {missing}")
+    n = len(raw)
+    reasons = np.full(n, "", dtype=object)
+    valid = {}
+    for column, (kind, lowest, highest) in SCHEMA.items():
+        series = raw[column]
+        if kind != "category" and pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype=np.float64)
+            absent = nan = np.isnan(values)
+        else:
+            text = series.astype("string").str.strip()
+            absent = (text.isna() | (text == "")).to_numpy()
+            if kind != "category":
+                values = pd.to_numeric(text, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                nan = np.isnan(values)
+        problems = [(absent, "missing")]
+        if kind == "category":
+            valid[column] = text.to_numpy(dtype=object)
+        else:
+            problems.append((nan & ~absent, "not a number"))
+            if kind == "int":
+                problems.append((~nan & (values != np.round(values)), "not an integer"))
+            problems.append((~nan & ((values < lowest) | (values > highest)), f"outside [{lowest}, {highest}]"))
+            valid[column] = values
+        for mask, reason in problems:
+            if mask.any():
+                reasons[mask] += f"{column} {reason}; "
+    bad = reasons != ""
+    good = ~bad
+    rejects = raw.loc[bad, list(SCHEMA)].astype(str).assign(
+        file=source, line=np.flatnonzero(bad) + first_line, reason=[r[:-2] for r in reasons[bad]])
+    dtypes = {"float": np.float32, "int": np.int32}
+    frame = pd.DataFrame({column: pd.Categorical(valid[column][good]) if kind == "category"
+                          else valid[column][good].astype(dtypes[kind])
+                          for column, (kind, _, _) in SCHEMA.items()})
+    return frame, _rejects(rejects.reset_index(drop=True))
+
+
+def _unreadable(name, exc):
+    frame = pd.DataFrame({c: pd.Series(dtype=np.float32) for c in SCHEMA})
+    return frame, _rejects(pd.DataFrame({"file": [name], "line": [None], "reason": [f"unreadable file: {exc}"]}))
+
+
+def parse(source, name, first_line=2):
+    """``(valid rows, rejects)`` of a CSV path or buffer; one that cannot be read becomes a single reject."""
+    options = dict(dtype={"Species": str}, skipinitialspace=True)
+    try:
+        try:
+            raw, malformed = pd.read_csv(source, **options), []
+        except pd.errors.ParserError:
+            # lines with the wrong number of fields: reparse with the python engine, which can hand them back
+            malformed = []
+            if isinstance(source, io.BytesIO):
+                source.seek(0)
+            raw = pd.read_csv(source, engine="python", on_bad_lines=malformed.append, **options)
+        frame, rejects = validate(raw, name, first_line)
+        if malformed:
+            bad = pd.DataFrame({"file": name, "line": None, "reason": [
+                f"malformed line ({len(fields)} fields): {','.join(fields)}" for fields in malformed]})
+            rejects = _rejects(pd.concat([rejects, bad], ignore_index=True))
+        return frame, rejects
+    except (OSError, UnicodeDecodeError, ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as exc:
+        return _unreadable(name, exc)
+
+
+def read_file(path):
+    """``(valid rows, rejects)`` of one file; a file that cannot be read becomes a single reject."""
+    return parse(path, os.path.basename(path))
+
+
+# ------------------ LEDGER ------------------
+def _stamp(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def _tail_hash(path, offset):
+    with open(path, "rb") as f:
+        f.seek(max(offset - TAIL_BYTES, 0))
+        return hashlib.sha1(f.read(min(offset, TAIL_BYTES))).hexdigest()
+
+
+def _read_new(path, start, end, lines):
+    """Worker: the complete lines of ``path`` between byte ``start`` and ``end`` and its ledger entry after them.
+
+    ``lines`` were read before ``start``; the header always comes from the
+    first line. A last line without its newline may still be being
+    written, so it is left for a later run and the offset stops before it.
+    """
+    name = os.path.basename(path)
+    try:
+        with open(path, "rb") as f:
+            header = f.readline() if start else b""
+            f.seek(start)
+            data = f.read(end - start)
+            data = data[:data.rfind(b"\n") + 1]
+            if data.count(b"\n") <= (0 if start else 1):  # no complete row yet
+                empty = pd.DataFrame({c: pd.Series(dtype=np.float32) for c in SCHEMA})
+                return empty, _rejects(pd.DataFrame()), {"offset": start, "lines": lines,
+                                                        "tail": _tail_hash(path, start)}
+        end = start + len(data)
+        tail = _tail_hash(path, end)
+    except OSError as exc:
+        return (*_unreadable(name, exc), {"offset": 0, "lines": 0, "tail": None})
+    frame, rejects = parse(io.BytesIO(header + data), name, lines + 1 if start else 2)
+    return frame, rejects, {"offset": end, "lines": lines + data.count(b"\n"), "tail": tail}
+
+
+def _plan(path, entry):
+    """``(start, stamp)`` to read ``path`` from, None to skip it, or ``(None, stamp)`` if it was rewritten."""
+    stamp = _stamp(path)  # before reading: rows written after this are picked up by the next run
+    if entry is None:
+        return 0, stamp
+    if isinstance(entry, str):  # ledger of an older version: no offset known
+        return None if entry == stamp else (None, stamp)
+    if entry["stamp"] == stamp:
+        return None
+    if entry.get("rows", 0) == 0:  # nothing stored from it yet, so rereading cannot duplicate
+        return 0, stamp
+    size = int(stamp.split("-")[0])
+    if size < entry["offset"] or _tail_hash(path, entry["offset"]) != entry["tail"]:
+        return None, stamp
+    return entry["offset"], stamp
+
+
+def read_ledger(store_dir):
+    path = os.path.join(store_dir, LEDGER)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_ledger(store_dir, ledger):
+    tmp = os.path.join(store_dir, LEDGER + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ledger, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, os.path.join(store_dir, LEDGER))
+
+
+# ------------------ BATCH ------------------
+def ingest_dir(input_dir, store_dir, pattern="*.csv", jobs=1, rejects_path=None, chunk_rows=1_000_000):
+    """Validate every new file of ``input_dir`` into ``store_dir``; returns ``(rows stored, rows rejected)``.
+
+    Valid rows are buffered and appended to the store in file order once
+    ``chunk_rows`` have accumulated, so hundreds of small files do not
+    mean hundreds of store versions. The ledger is written after each
+    append, so an interrupted run resumes where it stopped.
+    """
+    ledger = read_ledger(store_dir)
+    rejects_path = rejects_path or os.path.join(store_dir, "rejects.csv")
+    stored = rejected = 0
+    buffered, buffered_files = [], {}
+    parts, changed = [], []
+    for name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, name)
+        if not (fnmatch.fnmatch(name, pattern) and os.path.isfile(path)):
+            continue
+        plan = _plan(path, ledger.get(name))
+        if plan is None:
+            continue
+        start, stamp = plan
+        if start is None:
+            changed.append((name, stamp))
+            continue
+        entry = ledger.get(name) if start else None
+        parts.append((path, start, int(stamp.split("-")[0]), entry["lines"] if entry else 0, stamp))
+
+    def flush():
+        nonlocal buffered, buffered_files
+        frames = [f for f in buffered if len(f)]
+        if frames:
+            dataset_store.append(store_dir, pd.concat(frames, ignore_index=True))
+        if buffered_files:
+            os.makedirs(store_dir, exist_ok=True)
+            ledger.update(buffered_files)
+            _write_ledger(store_dir, ledger)
+        buffered, buffered_files = [], {}
+
+    def report(bad):
+        if len(bad):
+            header = not os.path.exists(rejects_path)
+            os.makedirs(os.path.dirname(rejects_path) or ".", exist_ok=True)
+            bad.to_csv(rejects_path, mode="a", header=header, index=False)
+
+    def collect(part, result):
+        nonlocal stored, rejected
+        path, start, _, _, stamp = part
+        name = os.path.basename(path)
+        frame, bad, progress = result
+        report(bad)
+        print(f"{'✅' if len(bad) == 0 else '⚠️'} {name}{' (new rows)' if start else ''}: "
+              f"{len(frame)} rows, {len(bad)} rejected")
+        stored += len(frame)
+        rejected += len(bad)
+        buffered.append(frame)
+        previous = ledger.get(name) if start else None
+        buffered_files[name] = dict(progress, stamp=stamp, rows=len(frame) + (previous["rows"] if previous else 0))
+        if sum(len(f) for f in buffered) >= chunk_rows:
+            flush()
+
+    for name, stamp in changed:
+        # its rows are already in the store; reading it again would append them twice
+        print(f"⚠️ {name}: changed since it was ingested, not re-read")
+        report(_rejects(pd.DataFrame({"file": [name], "line": [None], "reason": [
+            "file changed since it was ingested; its rows were not re-read"]})))
+        rejected += 1
+        entry = ledger.get(name)
+        buffered_files[name] = dict(entry, stamp=stamp) if isinstance(entry, dict) else stamp  # report once
+
+    if jobs <= 1:
+        for part in parts:
+            collect(part, _read_new(*part[:4]))
+    else:
+        # keep at most two files per worker in flight so memory stays bounded
+        with ProcessPoolExecutor(jobs) as pool:
+            pending = deque()
+            for part in parts:
+                pending.append((part, pool.submit(_read_new, *part[:4])))
+                if len(pending) >= 2 * jobs:
+                    part_done, future = pending.popleft()
+                    collect(part_done, future.result())
+            while pending:
+                part_done, future = pending.popleft()
+                collect(part_done, future.result())
+    flush()
+    return stored, rejected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate a directory of observation CSVs into a dataset store.")
+    parser.add_argument("input_dir")
+    parser.add_argument("store_dir")
+    parser.add_argument("--pattern", default="*.csv")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rejects", help="CSV report of rejected rows (default: <store_dir>/rejects.csv)")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    stored, rejected = ingest_dir(args.input_dir, args.store_dir, args.pattern, args.jobs, args.rejects,
+                                  args.chunk_rows)
+    print(f"✅ {stored} rows stored in {args.store_dir}, {rejected} rejected")
@@ -0,0 +1,258 @@
+"""Live sensor stream: buoy readings in, rolling statistics and predictions out.
+
+Readings arrive as text lines, either ``temperature,salinity[,unix time]``
+or a JSON object with ``temperature``, ``salinity`` and optionally ``ts``,
+from TCP clients on a local port and/or from a file that is being appended
+to (``tail -f`` style, surviving truncation and rotation). Parsed readings
+wait in a bounded queue; every tick they are drained as one batch, written
+into fixed-size ring buffers and predicted against every count model with
+one matmul. The rolling window statistics, the latest and windowed
+predictions and the most recent readings are written atomically to a JSON
+snapshot, which the dashboard's live page polls.
+
+All buffers are allocated up front and the queue drops its oldest reading
+when full, so memory and per-reading cost stay flat however long the
+stream runs.
+
+    python src/live_stream.py --listen 127.0.0.1:8700 --tail /var/log/buoy.log
+    echo "27.1,35.2" | nc 127.0.0.1 8700
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from predict_service import AllModels
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_PATH = os.environ.get("SAGAR_LIVE_SNAPSHOT", os.path.join(REPO_DIR, "data", "live_snapshot.json"))
+MAX_LINE = 4096
+TAIL_READ = 1 << 20  # bytes read from the tailed file per poll
+
+
+def parse_reading(line, now=None):
+    """``(ts, temperature, salinity)`` from one line, or None if it is not a reading."""
+    line = line.strip()
+    if not line:
+        return None
+    now = time.time() if now is None else now
+    try:
+        if line.startswith(b"{"):
+            obj = json.loads(line)
+            reading = (float(obj.get("ts", now)), float(obj["temperature"]), float(obj["salinity"]))
+        else:
+            fields = line.split(b",")
+            reading = (float(fields[2]) if len(fields) > 2 else now, float(fields[0]), float(fields[1]))
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return None
+    return reading if np.isfinite(reading).all() else None
+
+
+class RingBuffer:
+    """Fixed-capacity ring of float64 rows; writing never allocates."""
+
+    def __init__(self, capacity, width):
+        self.data = np.full((capacity, width), np.nan)
+        self.capacity = capacity
+        self.head = 0  # next row to write
+        self.size = 0
+
+    def extend(self, rows):
+        rows = rows[-self.capacity:]
+        n = len(rows)
+        first = min(n, self.capacity - self.head)
+        self.data[self.head:self.head + first] = rows[:first]
+        self.data[:n - first] = rows[first:]
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def filled(self):
+        """The stored rows, in storage order (for order-free statistics)."""
+        return self.data if self.size == self.capacity else self.data[:self.size]
+
+    def last(self, n):
+        """The newest ``n`` rows, oldest first."""
+        n = min(n, self.size)
+        return np.take(self.data, np.arange(self.head - n, self.head), axis=0, mode="wrap")
+
+
+class LiveStream:
+    def __init__(self, models_dir, capacity=3600, tick=1.0, queue_size=100_000,
+                 snapshot_path=SNAPSHOT_PATH, recent=300):
+        self.models = AllModels(models_dir)
+        self.tick = tick
+        self.snapshot_path = snapshot_path
+        self.recent = recent
+        self.queue = asyncio.Queue(queue_size)
+        self.readings = RingBuffer(capacity, 3)  # ts, temperature, salinity
+        self.predictions = None  # RingBuffer of one column per model, sized on the first tick
+        self.stacked = None
+        self.received = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.started = time.time()
+
+    # ------------------ INPUT ------------------
+    def offer(self, line):
+        """Queue one raw line; the oldest queued reading makes room when the queue is full."""
+        reading = parse_reading(line)
+        if reading is None:
+            self.rejected += 1
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(reading)
+        self.received += 1
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.offer(line)
+        except (ConnectionError, ValueError):  # ValueError: a line longer than MAX_LINE
+            self.rejected += 1
+        finally:
+            writer.close()
+
+    async def listen(self, host="127.0.0.1", port=8700):
+        return await asyncio.start_server(self._client, host, port, limit=MAX_LINE)
+
+    async def tail(self, path, poll=0.2, from_start=False):
+        position = None
+        identity = None  # (device, inode) of the file being read
+        partial = b""
+        while True:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                position = 0 if position is None else position  # a file created later is read in full
+                await asyncio.sleep(poll)
+                continue
+            size = stat.st_size
+            if position is None:
+                position = 0 if from_start else size
+            elif (stat.st_dev, stat.st_ino) != identity or size < position:  # rotated, or truncated in place
+                position, partial = 0, b""
+            identity = (stat.st_dev, stat.st_ino)
+            if size > position:
+                with open(path, "rb") as f:
+                    f.seek(position)
+                    chunk = f.read(min(size - position, TAIL_READ))
+                position += len(chunk)
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()  # incomplete last line
+                if len(partial) > MAX_LINE:
+                    partial = b""
+                    self.rejected += 1
+                for line in lines:
+                    self.offer(line)
+                if size > position:
+                    continue  # more to read right away
+            await asyncio.sleep(poll)
+
+    # ------------------ TICKS ------------------
+    def step(self):
+        """Drain the queue into the buffers as one batch and predict it; returns the batch size."""
+        n = self.queue.qsize()
+        if n == 0:
+            return 0
+        batch = np.array([self.queue.get_nowait() for _ in range(n)])
+        stacked = self.models.refresh()
+        if stacked is not self.stacked:  # models changed: old predictions no longer comparable
+            self.stacked = stacked
+            self.predictions = RingBuffer(self.readings.capacity, len(stacked.names))
+        self.readings.extend(batch)
+        self.predictions.extend(stacked.predict(batch[:, 1:]))
+        return n
+
+    def snapshot(self):
+        readings = self.readings.filled()
+        stats = {}
+        for i, column in ((1, "temperature"), (2, "salinity")):
+            values = readings[:, i]
+            stats[column] = ({"last": float(self.readings.last(1)[0, i]), "mean": float(values.mean()),
+                              "std": float(values.std()), "min": float(values.min()), "max": float(values.max())}
+                             if len(values) else None)
+        predictions = {}
+        if self.predictions is not None and self.predictions.size:
+            last = self.predictions.last(1)[0]
+            window = self.predictions.filled().mean(axis=0)
+            for k, (group, name) in enumerate(self.stacked.names):
+                predictions.setdefault(group, {})[name] = {"last": float(last[k]), "mean": float(window[k])}
+        recent = self.readings.last(self.recent)
+        span = readings[:, 0].max() - readings[:, 0].min() if len(readings) > 1 else 0.0
+        return {
+            "updated": time.time(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "received": self.received,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "window": {"readings": self.readings.size, "capacity": self.readings.capacity,
+                       "seconds": float(span), "rate_per_s": float(len(readings) / span) if span > 0 else None},
+            "stats": stats,
+            "predictions": predictions,
+            "recent": {"ts": recent[:, 0].tolist(), "temperature": recent[:, 1].tolist(),
+                       "salinity": recent[:, 2].tolist()},
+        }
+
+    def write_snapshot(self):
+        path = self.snapshot_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            self.step()
+            self.write_snapshot()
+            next_tick += self.tick
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    """The latest snapshot written by a running stream, or None."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+async def serve(args):
+    stream = LiveStream(args.models_dir, args.capacity, args.tick, snapshot_path=args.snapshot)
+    tasks = [asyncio.create_task(stream.run())]
+    if args.listen:
+        host, port = args.listen.rsplit(":", 1)
+        server = await stream.listen(host, int(port))
+        tasks.append(asyncio.create_task(server.serve_forever()))
+        print(f"✅ Listening for readings on {host}:{port}")
+    for path in args.tail:
+        tasks.append(asyncio.create_task(stream.tail(path, from_start=args.from_start)))
+        print(f"✅ Tailing {path}")
+    print(f"✅ Snapshot every {args.tick:g} s to {args.snapshot} (window {args.capacity} readings)")
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling statistics and predictions over live buoy readings.")
+    parser.add_argument("--models-dir", default=os.path.join(REPO_DIR, "models"))
+    parser.add_argument("--listen", metavar="HOST:PORT", help="accept line-based readings over TCP")
+    parser.add_argument("--tail", action="append", default=[], metavar="FILE", help="follow a file of readings")
+    parser.add_argument("--from-start", action="store_true", help="read tailed files from the beginning")
+    parser.add_argument("--capacity", type=int, default=3600, help="readings in the rolling window")
+    parser.add_argument("--tick", type=float, default=1.0, help="seconds between batches")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+    if not args.listen and not args.tail:
+        parser.error("give --listen and/or --tail")
+    asyncio.run(serve(args))
@@ -0,0 +1,225 @@
+"""In-process metrics for the dashboard hot paths.
+
+``METRICS`` holds counters and latency histograms keyed by name and
+labels. ``METRICS.span`` times a block (data loading, model loading,
+prediction, aggregation, figure rendering), feeds the ``span_seconds``
+histogram and buffers the timing for the JSON log of the current rerun.
+Everything exports in the Prometheus text format, e.g. for the
+node_exporter textfile collector:
+
+    METRICS.write_textfile("logs/dashboard.prom")
+    METRICS.log_json("logs/dashboard_metrics.jsonl", module="Heatmap")
+
+``SamplingProfiler`` samples the stack of one thread at a fixed interval
+from a background thread (standard library only), which is cheap enough
+to switch on for a single Streamlit rerun.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HELP = {
+    "span_seconds": "Duration of instrumented blocks.",
+    "span_errors_total": "Instrumented blocks that raised.",
+    "reruns_total": "Dashboard reruns per module.",
+    "model_cache_total": "Model registry lookups by result.",
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self, prefix="sagar"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._local = threading.local()  # span events of the current rerun, per script thread
+
+    # ------------------ RECORDING ------------------
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:  # st.stop() / st.rerun() raise BaseExceptions, which are not failures
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("span_seconds", elapsed, span=name, **labels)
+            if failed:
+                self.inc("span_errors_total", span=name, **labels)
+            events = getattr(self._local, "events", None)
+            if events is None:
+                events = self._local.events = []
+            events.append({"span": name, **labels, "ms": round(elapsed * 1000, 3), "error": failed})
+
+    def drain_events(self):
+        """Span events recorded on this thread since the last drain."""
+        events = getattr(self._local, "events", None) or []
+        self._local.events = []
+        return events
+
+    # ------------------ EXPORT ------------------
+    def summary(self):
+        """One row per histogram series with count, total and mean in milliseconds."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        return [{"metric": name, **dict(labels), "count": h.count, "total (ms)": round(h.sum * 1000, 2),
+                 "mean (ms)": round(h.sum / h.count * 1000, 2) if h.count else None}
+                for (name, labels), h in items]
+
+    def prometheus_text(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            histograms = [(key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in histograms]
+        lines, seen = [], set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {self.prefix}_{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{self.prefix}_{name}{_labels(labels)} {value}")
+        for (name, labels), buckets, counts, total, count in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip([*buckets, "+Inf"], counts):
+                cumulative += n
+                lines.append(f"{self.prefix}_{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.prefix}_{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{self.prefix}_{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def log_json(self, path, **fields):
+        """Append one JSON line with ``fields`` and the spans drained from this thread."""
+        record = {"ts": time.time(), **fields, "spans": self.drain_events()}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+
+METRICS = Metrics()
+
+
+# ------------------ PROFILING ------------------
+class SamplingProfiler:
+    """Samples one thread's Python stack every ``interval`` seconds.
+
+    Use as a context manager or with ``start``/``stop`` around the code to
+    profile; by default the calling thread is sampled.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()  # tuple of frames, outermost first -> samples
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        """Stacks in the collapsed ``a;b;c count`` format read by flamegraph.pl and speedscope."""
+        return "\n".join(f"{';'.join(stack)} {n}" for stack, n in self.stacks.most_common()) + "\n"
+
+    def top(self, n=20):
+        """The ``n`` functions with the most samples on the stack, with their own (self) samples."""
+        total, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            for frame in set(stack):
+                total[frame] += count
+            own[stack[-1]] += count
+        samples = max(self.samples, 1)
+        return [{"function": frame, "total %": round(100 * count / samples, 1),
+                 "self %": round(100 * own[frame] / samples, 1), "samples": count}
+                for frame, count in total.most_common(n)]
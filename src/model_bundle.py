@@ -0,0 +1,214 @@
+"""Single-file bundle holding every count model.
+
+Every model is a linear fit on (Temperature, Salinity), so the whole set
+is one float64 array with a row of (intercept, coefficients) per model.
+The bundle file is a short binary header, a JSON manifest naming the rows
+and the array itself, 64-byte aligned so it can be memory-mapped:
+
+    magic (8 bytes) | format (uint32) | manifest length (uint32) | manifest | padding | float64 rows | uncertainty
+
+From format 2 the coefficients may be followed by one uncertainty row per
+model (residual variance, residual degrees of freedom and the flattened
+(XᵀX)⁻¹, see ``SufficientStats.uncertainty``) for interval predictions.
+
+Loading is one ``np.memmap``; nothing is unpickled. The manifest carries a
+version (hash of names and coefficients) that changes whenever a model
+does. Windows refuses to replace a file that is mapped, so there readers
+load the rows into memory instead and a new bundle can always be saved
+over one that dashboards are serving. An existing directory of per-model ``.pkl`` files converts with
+
+    python src/model_bundle.py models
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+BUNDLE_FILE = "fish_count_models.bundle"
+MAGIC = b"SAGARMB\0"
+FORMAT_VERSION = 2
+FEATURES = ["Temperature (°C)", "Salinity (PSU)"]
+N_TERMS = len(FEATURES) + 1
+N_UNCERTAINTY = 2 + N_TERMS * N_TERMS  # sigma², dof, (XᵀX)⁻¹
+_HEADER = struct.Struct("<8sII")
+_ALIGN = 64
+
+
+def bundle_path(models_dir):
+    return os.path.join(models_dir, BUNDLE_FILE)
+
+
+class ModelBundle:
+    def __init__(self, groups, weights, version=None, uncertainty=None):
+        self.groups = {group: list(names) for group, names in groups.items()}  # group -> names, in row order
+        self.weights = weights  # (n_models, N_TERMS), may be a read-only memmap
+        self.uncertainty = uncertainty  # (n_models, N_UNCERTAINTY) or None for bundles without it
+        self._rows = {}
+        row = 0
+        for group, names in self.groups.items():
+            self._rows[group] = {name: row + i for i, name in enumerate(names)}
+            row += len(names)
+        if len(weights) != row:
+            raise ValueError(f"Bundle has {len(weights)} coefficient rows for {row} models")
+        if uncertainty is not None and len(uncertainty) != row:
+            raise ValueError(f"Bundle has {len(uncertainty)} uncertainty rows for {row} models")
+        self.version = version or self._digest()
+
+    def _digest(self):
+        digest = hashlib.sha1(json.dumps(self.groups, ensure_ascii=False).encode())
+        digest.update(np.ascontiguousarray(self.weights, dtype="<f8").tobytes())
+        if self.uncertainty is not None:
+            digest.update(np.ascontiguousarray(self.uncertainty, dtype="<f8").tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def from_models(cls, models):
+        """Bundle from ``{group: {name: LinearRegression}}``."""
+        groups, rows = {}, []
+        for group, group_models in models.items():
+            groups[group] = list(group_models)
+            for model in group_models.values():
+                rows.append(np.concatenate([[model.intercept_], np.ravel(model.coef_)]))
+        return cls(groups, np.array(rows, dtype=np.float64).reshape(len(rows), N_TERMS))
+
+    @classmethod
+    def from_stats(cls, group_stats):
+        """Bundle from ``{group: SufficientStats}``, with the uncertainty rows; empty groups are left out."""
+        groups, weights, uncertainty = {}, [], []
+        for group, stats in group_stats.items():
+            fitted = stats.n > 0
+            groups[group] = [name for name, keep in zip(stats.names, fitted) if keep]
+            weights.append(stats.solve()[fitted])
+            uncertainty.append(stats.uncertainty()[fitted])
+        return cls(groups, np.vstack(weights or [np.empty((0, N_TERMS))]),
+                   uncertainty=np.vstack(uncertainty or [np.empty((0, N_UNCERTAINTY))]))
+
+    def merged(self, other):
+        """Copy with the models of ``other`` added or replacing models of the same name.
+
+        Models whose bundle has no uncertainty rows get NaN ones, so their
+        intervals come out as NaN.
+        """
+        groups = {group: list(names) for group, names in self.groups.items()}
+        for group, names in other.groups.items():
+            groups.setdefault(group, []).extend(n for n in names if n not in groups[group])
+        rows, uncertainty = [], []
+        for group, names in groups.items():
+            for name in names:
+                source = other if name in other._rows.get(group, {}) else self
+                row = source._rows[group][name]
+                rows.append(source.weights[row])
+                uncertainty.append(np.full(N_UNCERTAINTY, np.nan) if source.uncertainty is None
+                                   else source.uncertainty[row])
+        with_uncertainty = self.uncertainty is not None or other.uncertainty is not None
+        return ModelBundle(groups, np.array(rows, dtype=np.float64).reshape(len(rows), N_TERMS),
+                           uncertainty=np.array(uncertainty).reshape(len(rows), N_UNCERTAINTY)
+                           if with_uncertainty else None)
+
+    # ------------------ LOOKUP ------------------
+    def names(self, group):
+        return list(self.groups.get(group, []))
+
+    def group_weights(self, group, names=None):
+        """``(len(names), N_TERMS)`` rows of a group; a view into the file when they are contiguous."""
+        rows = self._rows.get(group, {})
+        idx = [rows[name] for name in (self.names(group) if names is None else names)]
+        if idx and idx == list(range(idx[0], idx[0] + len(idx))):
+            return self.weights[idx[0]:idx[0] + len(idx)]
+        return self.weights[idx]
+
+    def group_uncertainty(self, group, names=None):
+        """``(len(names), N_UNCERTAINTY)`` uncertainty rows of a group, or None if the bundle has none."""
+        if self.uncertainty is None:
+            return None
+        rows = self._rows.get(group, {})
+        return self.uncertainty[[rows[name] for name in (self.names(group) if names is None else names)]]
+
+    def model(self, group, name):
+        """A fitted ``LinearRegression`` rebuilt from the coefficients."""
+        from sklearn.linear_model import LinearRegression  # only for callers that need estimator objects
+
+        w = np.array(self.weights[self._rows[group][name]])
+        model = LinearRegression()
+        model.coef_ = w[1:]
+        model.intercept_ = float(w[0])
+        model.n_features_in_ = len(FEATURES)
+        model.feature_names_in_ = np.array(FEATURES, dtype=object)
+        return model
+
+    # ------------------ PERSISTENCE ------------------
+    def save(self, path):
+        manifest = json.dumps({
+            "format": FORMAT_VERSION,
+            "version": self.version,
+            "features": FEATURES,
+            "dtype": "<f8",
+            "shape": [len(self.weights), N_TERMS],
+            "groups": self.groups,
+            "uncertainty": self.uncertainty is not None,
+        }, ensure_ascii=False).encode()
+        offset = _HEADER.size + len(manifest)
+        padding = -offset % _ALIGN
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(manifest)))
+            f.write(manifest)
+            f.write(b"\0" * padding)
+            f.write(np.ascontiguousarray(self.weights, dtype="<f8").tobytes())
+            if self.uncertainty is not None:
+                f.write(np.ascontiguousarray(self.uncertainty, dtype="<f8").tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap=None):
+        """Read a bundle; ``mmap`` (default: everywhere but Windows) maps the rows instead of reading them."""
+        mmap = os.name != "nt" if mmap is None else mmap
+        with open(path, "rb") as f:
+            magic, fmt, length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a model bundle")
+            if fmt > FORMAT_VERSION:
+                raise ValueError(f"{path} has bundle format {fmt}, this code reads up to {FORMAT_VERSION}")
+            manifest = json.loads(f.read(length))
+        offset = _HEADER.size + length
+        offset += -offset % _ALIGN
+        shape = tuple(manifest["shape"])
+        if shape[0] == 0:
+            weights = np.empty(shape)
+            uncertainty = np.empty((0, N_UNCERTAINTY)) if manifest.get("uncertainty") else None
+        else:
+            weights = _read_rows(path, manifest["dtype"], offset, shape, mmap)
+            uncertainty = None
+            if manifest.get("uncertainty"):
+                uncertainty = _read_rows(path, manifest["dtype"], offset + weights.nbytes,
+                                         (shape[0], N_UNCERTAINTY), mmap)
+        return cls(manifest["groups"], weights, manifest["version"], uncertainty)
+
+
+def _read_rows(path, dtype, offset, shape, mmap):
+    if mmap:
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return np.fromfile(f, dtype=dtype, count=shape[0] * shape[1]).reshape(shape)
+
+
+def migrate(models_dir):
+    """Write the bundle for a directory that only has the per-model ``.pkl`` layout."""
+    from model_registry import MODEL_GROUPS, ModelRegistry
+
+    legacy = ModelRegistry(models_dir, use_bundle=False)
+    bundle = ModelBundle.from_models({group: legacy.get_group(group) for group in MODEL_GROUPS})
+    bundle.save(bundle_path(models_dir))
+    return bundle
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack the per-model .pkl files of a models directory into one bundle.")
+    parser.add_argument("models_dir", nargs="?", default="models")
+    args = parser.parse_args()
+    bundle = migrate(args.models_dir)
+    print(f"✅ {len(bundle.weights)} models packed into {bundle_path(args.models_dir)} (version {bundle.version[:12]})")
@@ -0,0 +1,215 @@
+"""Process-wide registry for the fish count models.
+
+Models come from the single-file bundle (``model_bundle``) when the
+directory has one, otherwise from the older one-``.pkl``-per-model layout,
+whose directories are scanned once. Model objects are kept in a
+size-bounded LRU and everything is reloaded when the bundle or a model
+file changes on disk. Both Streamlit apps share one registry per models
+directory through ``get_registry``.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+
+from metrics import METRICS
+from model_bundle import ModelBundle, bundle_path
+
+# group -> (sub directory, file name prefix)
+MODEL_GROUPS = {
+    "general": ("", "fish_count_model"),
+    "species": ("per_species", "fish_count_model_"),
+    "length": ("per_length", "fish_count_model_length_"),
+    "weight": ("per_weight", "fish_count_model_weight_"),
+}
+GENERAL_NAME = "General"
+LENGTH_LABELS = ["short", "medium", "long"]
+WEIGHT_LABELS = ["light", "medium", "heavy"]
+LABEL_ORDER = {"length": LENGTH_LABELS, "weight": WEIGHT_LABELS}
+
+
+def model_path(models_dir, group, name):
+    """Where the model ``name`` of ``group`` lives under ``models_dir``."""
+    sub_dir, prefix = MODEL_GROUPS[group]
+    if group == "general":
+        return os.path.join(models_dir, prefix + ".pkl")
+    return os.path.join(models_dir, sub_dir, f"{prefix}{name}.pkl")
+
+
+def _ordered(group, names):
+    order = LABEL_ORDER.get(group)
+    if order is None:
+        return sorted(names)
+    known = [n for n in order if n in names]
+    return known + sorted(n for n in names if n not in order)
+
+
+class ModelRegistry:
+    def __init__(self, models_dir, max_models=64, use_bundle=True):
+        self.models_dir = models_dir
+        self.max_models = max_models
+        self.use_bundle = use_bundle
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()  # (group, name) -> (stamp, model)
+        self._index = {}
+        self.bundle = None
+        self._bundle_mtime = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.refresh()
+
+    # ------------------ DIRECTORY INDEX ------------------
+    def _bundle_stat(self):
+        if not self.use_bundle:
+            return None
+        try:
+            return os.stat(bundle_path(self.models_dir)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load_bundle(self):
+        return ModelBundle.load(bundle_path(self.models_dir))
+
+    def _sync(self):
+        """Reload when the bundle was written, replaced or removed since the last refresh."""
+        if self._bundle_stat() != self._bundle_mtime:
+            self.refresh()
+
+    def refresh(self):
+        """Re-read the bundle or rescan the ``.pkl`` directories."""
+        mtime = self._bundle_stat()
+        if mtime is not None:
+            path = bundle_path(self.models_dir)
+            bundle = self._load_bundle()
+            index = {group: {name: path for name in _ordered(group, bundle.names(group))} for group in MODEL_GROUPS}
+            with self._lock:
+                self.bundle, self._bundle_mtime, self._index = bundle, mtime, index
+            return
+        index = {}
+        for group, (sub_dir, prefix) in MODEL_GROUPS.items():
+            if group == "general":
+                path = model_path(self.models_dir, group, GENERAL_NAME)
+                index[group] = {GENERAL_NAME: path} if os.path.isfile(path) else {}
+                continue
+            group_dir = os.path.join(self.models_dir, sub_dir)
+            found = {}
+            if os.path.isdir(group_dir):
+                for fname in os.listdir(group_dir):
+                    if fname.startswith(prefix) and fname.endswith(".pkl"):
+                        found[fname[len(prefix):-len(".pkl")]] = os.path.join(group_dir, fname)
+            index[group] = {name: found[name] for name in _ordered(group, found)}
+        with self._lock:
+            self.bundle, self._bundle_mtime, self._index = None, None, index
+
+    def names(self, group):
+        self._sync()
+        return list(self._index.get(group, {}))
+
+    def path(self, group, name):
+        try:
+            return self._index[group][name]
+        except KeyError:
+            raise KeyError(f"No {group} model named {name!r} in {self.models_dir}") from None
+
+    def fingerprint(self, group):
+        """(name, stamp) for every model of a group; changes whenever a model is rewritten."""
+        self._sync()
+        return tuple((name, self._stamp(path)) for name, path in self._index.get(group, {}).items())
+
+    def _stamp(self, path):
+        # every model in the bundle shares the bundle's content version
+        bundle = self.bundle
+        return bundle.version if bundle is not None else os.stat(path).st_mtime_ns
+
+    def weights(self, group):
+        """Names and ``(n, 3)`` intercept/coefficient rows of a group, without building model objects."""
+        self._sync()
+        names = self.names(group)
+        bundle = self.bundle
+        if bundle is not None:
+            return names, bundle.group_weights(group, names)
+        weights = np.empty((len(names), 3))
+        for i, model in enumerate(self.get_group(group).values()):
+            weights[i, 0] = model.intercept_
+            weights[i, 1:] = np.ravel(model.coef_)
+        return names, weights
+
+    def uncertainty(self, group):
+        """Uncertainty rows of a group (see ``ModelBundle``), or None when the models carry none."""
+        self._sync()
+        bundle = self.bundle
+        if bundle is None:
+            return None
+        return bundle.group_uncertainty(group, self.names(group))
+
+    # ------------------ MODEL CACHE ------------------
+    def get(self, group, name):
+        self._sync()
+        path = self.path(group, name)
+        bundle = self.bundle
+        stamp = self._stamp(path)
+        key = (group, name)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                METRICS.inc("model_cache_total", result="hit")
+                return cached[1]
+            if cached is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            METRICS.inc("model_cache_total", result="miss" if cached is None else "reload")
+            start = time.perf_counter()
+            with METRICS.span("model load", group=group):
+                model = bundle.model(group, name) if bundle is not None else joblib.load(path)
+            self.load_seconds += time.perf_counter() - start
+            self._cache[key] = (stamp, model)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_models:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+            return model
+
+    def get_group(self, group):
+        return {name: self.get(group, name) for name in self.names(group)}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "cached": len(self._cache),
+                "load_seconds": self.load_seconds,
+                "bundle": self.bundle.version if self.bundle is not None else None,
+            }
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(models_dir, max_models=64):
+    """Return the shared registry for ``models_dir``, creating it on first use."""
+    key = os.path.abspath(models_dir)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = ModelRegistry(models_dir, max_models=max_models)
+        return registry
+
+
+def install_registry(models_dir, registry):
+    """Make ``registry`` the shared one for ``models_dir`` (e.g. a registry over shared memory)."""
+    with _registries_lock:
+        _registries[os.path.abspath(models_dir)] = registry
+    return registry
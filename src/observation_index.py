@@ -0,0 +1,241 @@
+"""Nearest historical observations in (Temperature, Salinity).
+
+The observations are bucketed on a regular grid over the two features and
+stored in CSR form: the coordinates and row numbers sorted by grid cell,
+plus one offset per cell. A k-nearest query visits the cells around the
+query point in growing square blocks and stops as soon as the k-th
+distance is below the distance to the edge of the visited block, so it
+only touches a few cells however large the table is. Distances are plain
+Euclidean in (°C, PSU).
+
+Rows appended with ``update`` are buffered and bucketed in one go before
+the next query or save. When the rows per cell have outgrown the grid
+(the side it would be sized to has doubled) or buffered rows fall outside
+its extent, the grid is resized over all rows instead, so queries stay
+as fast as on a freshly built index. ``cached_index`` catches a saved
+index up with only the rows appended to a dataset store, like
+``summary_store.cached_summary``:
+
+    index = ObservationIndex.build(df)
+    rows, dist = index.knn(27.0, 35.0, k=5)
+    rows, dist = index.radius(27.0, 35.0, 0.3)
+
+    python src/observation_index.py data/fish_data.store
+"""
+import argparse
+import os
+
+import numpy as np
+
+import dataset_store
+from predict_engine import FEATURES
+
+INDEX_FILE = "observation_index.npz"
+PER_CELL = 32  # target observations per cell when the grid is sized
+MAX_CELLS = 1024  # per axis
+
+
+def _ranges(starts, ends):
+    """Concatenation of ``arange(start, end)`` for every pair."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.intp)
+    shift = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return shift + np.arange(total)
+
+
+class ObservationIndex:
+    def __init__(self, origin, cell, shape, coords, rows, offsets, n_rows=0, version=None,
+                 per_cell=PER_CELL, max_cells=MAX_CELLS):
+        self.origin = np.asarray(origin, dtype=np.float64)  # lower corner of cell (0, 0)
+        self.cell = np.asarray(cell, dtype=np.float64)  # cell width per axis
+        self.shape = tuple(int(v) for v in shape)
+        self.coords = coords  # (n, 2) float32, sorted by cell
+        self.rows = rows  # row number in the source table of each coordinate
+        self.offsets = offsets  # (n_cells + 1,) start of each cell in coords
+        self.n_rows = n_rows  # source rows seen, including rows without coordinates
+        self.version = version
+        self.per_cell = per_cell
+        self.max_cells = max_cells
+        self._pending = []  # (coords, rows) appended by update() and not bucketed yet
+
+    @classmethod
+    def build(cls, df, version=None, per_cell=PER_CELL, max_cells=MAX_CELLS):
+        index = cls(np.zeros(2), np.ones(2), (1, 1), np.empty((0, 2), dtype=np.float32),
+                    np.empty(0, dtype=np.int64), np.zeros(2, dtype=np.int64),
+                    per_cell=per_cell, max_cells=max_cells)
+        index.update(df)
+        index._flush()
+        index.version = version
+        return index
+
+    def __len__(self):
+        return len(self.rows) + sum(len(rows) for _, rows in self._pending)
+
+    # ------------------ UPDATE ------------------
+    def _cell_index(self, X):
+        ij = np.floor((X - self.origin) / self.cell).astype(np.int64)
+        ij = np.clip(ij, 0, np.array(self.shape) - 1)
+        return ij[:, 0] * self.shape[1] + ij[:, 1]
+
+    def _side(self, n):
+        return int(np.clip(np.sqrt(n / self.per_cell), 1, self.max_cells))
+
+    def _regrid(self, coords, rows):
+        """Size the grid to ``coords`` and bucket them, ordered by cell then row."""
+        if len(coords):
+            lo, hi = coords.min(axis=0).astype(np.float64), coords.max(axis=0).astype(np.float64)
+        else:
+            lo, hi = np.zeros(2), np.ones(2)
+        side = self._side(len(coords))
+        span = np.where(hi > lo, hi - lo, 1.0)
+        self.origin, self.cell, self.shape = lo, span / side * (1 + 1e-9), (side, side)
+        cells = self._cell_index(coords.astype(np.float64))
+        order = np.lexsort((rows, cells))
+        self.coords, self.rows = coords[order], rows[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=side * side))])
+
+    def update(self, df):
+        """Add the rows of ``df``, numbered on from the rows already indexed; bucketed before the next query."""
+        X = df[FEATURES].to_numpy(dtype=np.float64)
+        rows = self.n_rows + np.arange(len(X), dtype=np.int64)
+        self.n_rows += len(X)
+        present = ~np.isnan(X).any(axis=1)
+        if present.any():
+            self._pending.append((X[present].astype(np.float32), rows[present]))
+        return self
+
+    def _flush(self):
+        """Bucket the buffered rows: inserted into their cells, or a resized grid when they outgrow it."""
+        if not self._pending:
+            return
+        coords = np.concatenate([c for c, _ in self._pending])
+        rows = np.concatenate([r for _, r in self._pending])
+        self._pending = []
+        top = self.origin + self.cell * np.array(self.shape)
+        outside = (coords < self.origin).any() or (coords >= top).any()
+        if len(self.rows) == 0 or outside or self._side(len(self.rows) + len(rows)) >= 2 * self.shape[0]:
+            self._regrid(np.concatenate([self.coords, coords]), np.concatenate([self.rows, rows]))
+            return
+        cells = self._cell_index(coords.astype(np.float64))
+        order = np.argsort(cells, kind="stable")
+        cells = cells[order]
+        at = self.offsets[cells + 1]  # end of each row's cell, so rows keep their order within a cell
+        self.coords = np.insert(self.coords, at, coords[order], axis=0)
+        self.rows = np.insert(self.rows, at, rows[order])
+        counts = np.bincount(cells, minlength=len(self.offsets) - 1)
+        self.offsets = self.offsets + np.concatenate([[0], np.cumsum(counts)])
+
+    # ------------------ QUERIES ------------------
+    def _candidates(self, i0, i1, j0, j1, inner=None):
+        """Positions of the points in cells [i0, i1] x [j0, j1], minus the block ``inner``."""
+        ii, jj = np.meshgrid(np.arange(i0, i1 + 1), np.arange(j0, j1 + 1), indexing="ij")
+        ii, jj = ii.ravel(), jj.ravel()
+        if inner is not None:
+            ci, cj, r = inner
+            keep = (np.abs(ii - ci) > r) | (np.abs(jj - cj) > r)
+            ii, jj = ii[keep], jj[keep]
+        cells = ii * self.shape[1] + jj
+        return _ranges(self.offsets[cells], self.offsets[cells + 1])
+
+    def _distances(self, positions, q):
+        d = self.coords[positions].astype(np.float64) - q
+        return np.sqrt((d * d).sum(axis=1))
+
+    def knn(self, temperature, salinity, k=5):
+        """Row numbers and distances of the ``k`` nearest observations, nearest first."""
+        self._flush()
+        q = np.array([temperature, salinity], dtype=np.float64)
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        nx, ny = self.shape
+        ci, cj = divmod(int(self._cell_index(q[None])[0]), ny)
+        best_pos, best_d = np.empty(0, dtype=np.intp), np.empty(0)
+        prev, r = None, 0
+        while True:
+            i0, i1, j0, j1 = max(ci - r, 0), min(ci + r, nx - 1), max(cj - r, 0), min(cj + r, ny - 1)
+            positions = self._candidates(i0, i1, j0, j1, None if prev is None else (ci, cj, prev))
+            if len(positions):
+                best_pos = np.concatenate([best_pos, positions])
+                best_d = np.concatenate([best_d, self._distances(positions, q)])
+                if len(best_d) > k:
+                    keep = np.argpartition(best_d, k - 1)[:k]
+                    best_pos, best_d = best_pos[keep], best_d[keep]
+            if i0 == 0 and j0 == 0 and i1 == nx - 1 and j1 == ny - 1:
+                break
+            # unvisited points lie outside the block; edge cells extend to infinity
+            lo = self.origin + np.array([i0, j0]) * self.cell
+            hi = self.origin + np.array([i1 + 1, j1 + 1]) * self.cell
+            lo[[i0 == 0, j0 == 0]] = -np.inf
+            hi[[i1 == nx - 1, j1 == ny - 1]] = np.inf
+            if len(best_d) == k and best_d.max() <= min((q - lo).min(), (hi - q).min()):
+                break
+            prev, r = r, 2 * r + 1
+        order = np.argsort(best_d, kind="stable")
+        return self.rows[best_pos[order]], best_d[order]
+
+    def radius(self, temperature, salinity, r):
+        """Row numbers and distances of every observation within ``r``, nearest first."""
+        self._flush()
+        q = np.array([temperature, salinity], dtype=np.float64)
+        lo = self._cell_index((q - r)[None])[0]
+        hi = self._cell_index((q + r)[None])[0]
+        ny = self.shape[1]
+        positions = self._candidates(lo // ny, hi // ny, lo % ny, hi % ny)
+        d = self._distances(positions, q)
+        within = d <= r
+        positions, d = positions[within], d[within]
+        order = np.argsort(d, kind="stable")
+        return self.rows[positions[order]], d[order]
+
+    # ------------------ PERSISTENCE ------------------
+    def save(self, path):
+        self._flush()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, origin=self.origin, cell=self.cell, shape=np.array(self.shape),
+                     coords=self.coords, rows=self.rows, offsets=self.offsets,
+                     n_rows=self.n_rows, version=str(self.version or ""))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["origin"], saved["cell"], saved["shape"], saved["coords"], saved["rows"],
+                       saved["offsets"], int(saved["n_rows"]), str(saved["version"]) or None)
+
+
+def cached_index(df, version, path=None, store_dir=None):
+    """The index saved at ``path`` brought up to ``version``.
+
+    When ``df`` is a dataset store that has only grown since the index was
+    saved, just the appended rows are inserted; otherwise the index is
+    rebuilt from ``df``.
+    """
+    index = ObservationIndex.load(path) if path and version and os.path.exists(path) else None
+    if index is not None and index.version == version:
+        return index
+    if index is not None and store_dir and index.version:
+        start = dataset_store.rows_at_version(store_dir, index.version)
+        if start is not None and start == index.n_rows:
+            index.update(df.iloc[start:])
+            index.version = version
+            index.save(path)
+            return index
+    index = ObservationIndex.build(df, version=version)
+    if path and version:
+        index.save(path)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the nearest-observation index of a dataset store.")
+    parser.add_argument("store_dir")
+    args = parser.parse_args()
+    df = dataset_store.load(args.store_dir, FEATURES)
+    index = cached_index(df, dataset_store.version(args.store_dir),
+                         os.path.join(args.store_dir, INDEX_FILE), args.store_dir)
+    print(f"✅ {len(index)} observations indexed on a {index.shape[0]}x{index.shape[1]} grid "
+          f"in {os.path.join(args.store_dir, INDEX_FILE)}")
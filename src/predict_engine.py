@@ -0,0 +1,164 @@
+"""Fused prediction over every model of a group.
+
+All count models are ``LinearRegression`` fits on (Temperature, Salinity),
+so a group of them packs into one coefficient matrix (read straight from
+the model bundle when there is one) and the predictions for every
+category and every input row come out of a single matmul.
+
+Models trained from sufficient statistics also carry their residual
+variance and (XᵀX)⁻¹, so confidence and prediction intervals follow in
+closed form: with x = [1, temperature, salinity] and h = xᵀ(XᵀX)⁻¹x the
+half-widths are t·σ·√h for the mean and t·σ·√(1 + h) for a new
+observation, t being the Student t quantile at n - 3 degrees of freedom.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_registry import get_registry
+
+FEATURES = ["Temperature (°C)", "Salinity (PSU)"]
+N_TERMS = len(FEATURES) + 1
+
+
+def as_features(X):
+    """Return inputs as a float64 ``(n_rows, 2)`` array.
+
+    Accepts a DataFrame with the feature columns, an array of
+    (temperature, salinity) rows or a single pair.
+    """
+    if isinstance(X, pd.DataFrame):
+        X = X[FEATURES].to_numpy(dtype=np.float64)
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.shape[1] != len(FEATURES):
+        raise ValueError(f"Expected {len(FEATURES)} feature columns, got {X.shape[1]}")
+    return X
+
+
+class StackedModels:
+    """Coefficients of several linear models stacked into one matrix.
+
+    ``weights`` has one row per category: intercept followed by the
+    feature coefficients, so ``[1, X] @ weights.T`` predicts all of them.
+    """
+
+    def __init__(self, names, weights, uncertainty=None):
+        self.names = list(names)
+        self.weights = np.asarray(weights, dtype=np.float64).reshape(len(self.names), N_TERMS)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        if uncertainty is None:
+            uncertainty = np.full((len(self.names), 2 + N_TERMS * N_TERMS), np.nan)
+        uncertainty = np.asarray(uncertainty, dtype=np.float64).reshape(len(self.names), -1)
+        self.sigma2 = uncertainty[:, 0]
+        self.dof = uncertainty[:, 1]
+        self.xtx_inv = uncertainty[:, 2:].reshape(len(self.names), N_TERMS, N_TERMS)
+        self._t = {}  # level -> t quantile per category
+
+    @classmethod
+    def from_models(cls, models):
+        weights = np.empty((len(models), len(FEATURES) + 1))
+        for i, model in enumerate(models.values()):
+            weights[i, 0] = model.intercept_
+            weights[i, 1:] = np.ravel(model.coef_)
+        return cls(models.keys(), weights)
+
+    def predict(self, X):
+        """Predictions as an ``(n_rows, n_categories)`` array."""
+        X = as_features(X)
+        return X @ self.weights[:, 1:].T + self.weights[:, 0]
+
+    def predict_one(self, name, X):
+        w = self.weights[self.index[name]]
+        return as_features(X) @ w[1:] + w[0]
+
+    def predict_frame(self, X):
+        return pd.DataFrame(self.predict(X), columns=self.names)
+
+    def _t_quantile(self, level):
+        t = self._t.get(level)
+        if t is None:
+            from scipy.stats import t as student_t
+
+            with np.errstate(invalid="ignore"):
+                t = self._t[level] = student_t.ppf(0.5 + level / 2, np.where(self.dof > 0, self.dof, np.nan))
+        return t
+
+    def intervals(self, X, level=0.95):
+        """Predictions and interval half-widths, each ``(n_rows, n_categories)``.
+
+        Returns ``(fit, conf, pred)``: the mean response lies in
+        ``fit ± conf`` and a new observation in ``fit ± pred`` with
+        probability ``level``. Half-widths are NaN for models trained
+        without the statistics.
+        """
+        X = as_features(X)
+        x = np.column_stack([np.ones(len(X)), X])
+        fit = x @ self.weights.T
+        h = np.einsum("ni,kij,nj->nk", x, self.xtx_inv, x, optimize=True)
+        t = self._t_quantile(level)
+        with np.errstate(invalid="ignore"):
+            conf = t * np.sqrt(self.sigma2 * h)
+            pred = t * np.sqrt(self.sigma2 * (1 + h))
+        return fit, conf, pred
+
+
+class PredictionEngine:
+    """Keeps one ``StackedModels`` per model group, rebuilt when a model file changes."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._stacks = {}  # group -> (fingerprint, StackedModels)
+
+    def stack(self, group):
+        fingerprint = self.registry.fingerprint(group)
+        with self._lock:
+            cached = self._stacks.get(group)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+            stacked = StackedModels(*self.registry.weights(group), self.registry.uncertainty(group))
+            self._stacks[group] = (fingerprint, stacked)
+            return stacked
+
+    def predict_all(self, group, X):
+        return self.stack(group).predict(X)
+
+    def predict(self, group, name, X):
+        return self.stack(group).predict_one(name, X)
+
+    def predict_interval(self, group, name, X, level=0.95):
+        """``(fit, conf, pred)`` arrays of one model, as in ``StackedModels.intervals``."""
+        stacked = self.stack(group)
+        fit, conf, pred = stacked.intervals(X, level)
+        i = stacked.index[name]
+        return fit[:, i], conf[:, i], pred[:, i]
+
+    def compare(self, group, X, level=None):
+        """Single-input comparison table with one row per category.
+
+        With a ``level`` the table also has the bounds of the confidence and
+        prediction intervals.
+        """
+        stacked = self.stack(group)
+        if level is None:
+            return pd.DataFrame({"Category": stacked.names, "Predicted Count": stacked.predict(X)[0]})
+        fit, conf, pred = (a[0] for a in stacked.intervals(X, level))
+        return pd.DataFrame({"Category": stacked.names, "Predicted Count": fit,
+                             "Confidence Low": fit - conf, "Confidence High": fit + conf,
+                             "Prediction Low": fit - pred, "Prediction High": fit + pred})
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(models_dir):
+    registry = get_registry(models_dir)
+    with _engines_lock:
+        engine = _engines.get(id(registry))
+        if engine is None:
+            engine = _engines[id(registry)] = PredictionEngine(registry)
+        return engine
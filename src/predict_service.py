@@ -0,0 +1,262 @@
+"""Headless HTTP prediction service over the count models.
+
+A small asyncio HTTP/1.1 server (standard library only, bound to
+localhost by default). Concurrent single-row requests are queued and
+coalesced into micro-batches: the first request opens a short window
+(2 ms by default), everything that arrives within it is stacked into one
+array and predicted against all models with a single matmul.
+
+    python src/predict_service.py --port 8600
+
+    POST /predict        {"group": "species", "name": "Tuna", "temperature": 27.0, "salinity": 35.0}
+    POST /predict/batch  {"group": "species", "name": "Tuna", "rows": [[27.0, 35.0], [26.1, 34.2]]}
+    GET  /models
+    GET  /health
+
+Leaving out ``name`` returns every category of the group. Malformed
+requests and non-finite features get a 400 with an ``error`` message; any
+other failure is logged with its traceback and answered with a 500.
+"""
+import argparse
+import asyncio
+import json
+import time
+import traceback
+import urllib.request
+
+import numpy as np
+
+from model_registry import MODEL_GROUPS
+from predict_engine import StackedModels, as_features, get_engine
+
+MAX_BODY = 64 * 1024 * 1024
+
+
+class AllModels:
+    """Every model of every group in one ``StackedModels``, rebuilt when a model file changes."""
+
+    def __init__(self, models_dir):
+        self.engine = get_engine(models_dir)
+        self._fingerprint = None
+        self.stacked = None
+        self.columns = {}  # group -> (names, column indices)
+
+    def refresh(self):
+        registry = self.engine.registry
+        fingerprint = [registry.fingerprint(group) for group in MODEL_GROUPS]
+        if fingerprint == self._fingerprint:
+            return self.stacked
+        names, weights, columns = [], [], {}
+        for group in MODEL_GROUPS:
+            stacked = self.engine.stack(group)
+            columns[group] = (stacked.names, list(range(len(names), len(names) + len(stacked.names))))
+            names += [(group, name) for name in stacked.names]
+            weights.append(stacked.weights)
+        self.stacked = StackedModels(names, np.vstack(weights) if weights else np.empty((0, 3)))
+        self.columns, self._fingerprint = columns, fingerprint
+        return self.stacked
+
+    def check(self, group, name=None):
+        self.refresh()
+        if group not in self.columns:
+            raise KeyError(f"Unknown model group: {group}")
+        if name is not None and name not in self.columns[group][0]:
+            raise KeyError(f"No {group} model named {name!r}")
+
+    def select(self, predictions, group, name=None):
+        """Pick one model's column, or a {name: column} dict for the whole group."""
+        self.check(group, name)
+        names, cols = self.columns[group]
+        if name is None:
+            return {n: predictions[:, c] for n, c in zip(names, cols)}
+        return predictions[:, cols[names.index(name)]]
+
+
+class MicroBatcher:
+    """Coalesces single-row predictions that arrive within ``window`` seconds."""
+
+    def __init__(self, models, window=0.002, max_batch=4096):
+        self.models = models
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.rows = 0
+
+    async def predict_row(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(items) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                predictions = self.models.refresh().predict(np.array([row for row, _ in items]))
+            except Exception as exc:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.rows += len(items)
+            for i, (_, future) in enumerate(items):
+                if not future.done():
+                    future.set_result(predictions[i:i + 1])
+
+
+class PredictionService:
+    def __init__(self, models_dir, window=0.002, max_batch=4096):
+        self.models = AllModels(models_dir)
+        self.batcher = MicroBatcher(self.models, window, max_batch)
+        self.started = time.time()
+
+    # ------------------ ENDPOINTS ------------------
+    async def handle(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "uptime_s": round(time.time() - self.started, 3),
+                         "batches": self.batcher.batches, "rows": self.batcher.rows,
+                         "registry": self.models.engine.registry.stats()}
+        if method == "GET" and path == "/models":
+            registry = self.models.engine.registry
+            return 200, {group: registry.names(group) for group in MODEL_GROUPS}
+        if method == "POST" and path == "/predict":
+            req = json.loads(body or b"{}")
+            row = _finite([float(req["temperature"]), float(req["salinity"])])[0]
+            self.models.check(req["group"], req.get("name"))
+            predictions = await self.batcher.predict_row(row)
+            return 200, {"prediction": _jsonable(self.models.select(predictions, req["group"], req.get("name")), 0)}
+        if method == "POST" and path == "/predict/batch":
+            req = json.loads(body or b"{}")
+            rows = req["rows"] if "rows" in req else np.column_stack([req["temperature"], req["salinity"]])
+            predictions = self.models.refresh().predict(_finite(rows))
+            return 200, {"predictions": _jsonable(self.models.select(predictions, req["group"], req.get("name")))}
+        return 404, {"error": f"No route for {method} {path}"}
+
+    # ------------------ HTTP ------------------
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, payload = 413, {"error": "Request body too large"}
+                    body = None
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await self.handle(method, path.split("?", 1)[0], body)
+                    except (KeyError, ValueError, TypeError) as exc:
+                        status, payload = 400, {"error": str(exc.args[0]) if exc.args else str(exc)}
+                    except Exception:
+                        traceback.print_exc()
+                        status, payload = 500, {"error": "Internal server error"}
+                try:
+                    data = json.dumps(payload, allow_nan=False).encode()
+                except ValueError:  # a model produced NaN or inf
+                    traceback.print_exc()
+                    status, data = 500, json.dumps({"error": "Internal server error"}).encode()
+                close = headers.get("connection", "").lower() == "close" or body is None
+                writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8600):
+        self._batch_task = asyncio.create_task(self.batcher.run())
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+
+
+def _finite(rows):
+    """Feature rows as ``as_features`` returns them; NaN or inf is a bad request."""
+    X = as_features(rows)
+    if not np.isfinite(X).all():
+        raise ValueError("Features must be finite numbers")
+    return X
+
+
+def _jsonable(selected, row=None):
+    if isinstance(selected, dict):
+        return {name: _jsonable(col, row) for name, col in selected.items()}
+    return float(selected[row]) if row is not None else selected.tolist()
+
+
+class PredictClient:
+    """Minimal blocking client, e.g. for calling the service from Streamlit."""
+
+    def __init__(self, base_url="http://127.0.0.1:8600", timeout=5.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        req = urllib.request.Request(self.base_url + path, data=data,
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read())
+
+    def predict(self, group, temperature, salinity, name=None):
+        payload = {"group": group, "temperature": temperature, "salinity": salinity}
+        if name is not None:
+            payload["name"] = name
+        return self._call("/predict", payload)["prediction"]
+
+    def predict_batch(self, group, rows, name=None):
+        payload = {"group": group, "rows": [list(map(float, r)) for r in rows]}
+        if name is not None:
+            payload["name"] = name
+        return self._call("/predict/batch", payload)["predictions"]
+
+    def models(self):
+        return self._call("/models")
+
+    def health(self):
+        return self._call("/health")
+
+
+async def serve(models_dir, host, port, window):
+    service = PredictionService(models_dir, window)
+    server = await service.start(host, port)
+    print(f"✅ Prediction service on http://{host}:{port} (micro-batch window {window * 1000:.1f} ms)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fish count predictions over HTTP.")
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(serve(args.models_dir, args.host, args.port, args.window_ms / 1000))
@@ -0,0 +1,160 @@
+"""Precomputed predictions of every count model over a slider grid.
+
+The Fish Count sliders only produce points on a fixed grid (temperature
+24-30 and salinity 33-37 in 0.1 steps by default), so every model in
+``models/`` is evaluated once over that grid and stored as one float64
+array of shape (n_temperature, n_salinity, n_models), together with the
+half-widths of the 95% confidence and prediction intervals at every point.
+A prediction, with or without its intervals, is then an array index. The table is saved next to the models, tagged with their
+file fingerprints, and rebuilt as soon as any model file changes. Points
+off the grid fall back to the stacked-coefficient engine.
+"""
+import argparse
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_registry import MODEL_GROUPS, get_registry
+from predict_engine import get_engine
+
+TABLE_FILE = "prediction_table.npz"
+TEMP_GRID = (24.0, 30.0, 0.1)  # start, stop (inclusive), step
+SAL_GRID = (33.0, 37.0, 0.1)
+TABLE_LEVEL = 0.95  # interval level tabulated with the predictions
+
+
+def grid_axis(start, stop, step):
+    n = int(round((stop - start) / step)) + 1
+    return np.round(start + step * np.arange(n), 10)
+
+
+def models_fingerprint(registry):
+    return repr([(group, registry.fingerprint(group)) for group in MODEL_GROUPS])
+
+
+class PredictionTable:
+    def __init__(self, models_dir, temp_grid, sal_grid, columns, values, fingerprint,
+                 conf=None, pred=None, level=TABLE_LEVEL):
+        self.models_dir = models_dir
+        self.temp_grid = tuple(float(v) for v in temp_grid)
+        self.sal_grid = tuple(float(v) for v in sal_grid)
+        self.columns = [tuple(c) for c in columns]  # (group, name) per model
+        self.values = values
+        self.conf = conf  # interval half-widths at ``level``, same shape as ``values``; None if not tabulated
+        self.pred = pred
+        self.level = float(level)
+        self.fingerprint = fingerprint
+        self._col = {c: i for i, c in enumerate(self.columns)}
+
+    @classmethod
+    def build(cls, models_dir, temp_grid=TEMP_GRID, sal_grid=SAL_GRID):
+        engine = get_engine(models_dir)
+        fingerprint = models_fingerprint(engine.registry)
+        temps, sals = grid_axis(*temp_grid), grid_axis(*sal_grid)
+        t, s = np.meshgrid(temps, sals, indexing="ij")
+        X = np.column_stack([t.ravel(), s.ravel()])
+        columns, blocks = [], []
+        for group in MODEL_GROUPS:
+            stacked = engine.stack(group)
+            columns += [(group, name) for name in stacked.names]
+            blocks.append(stacked.intervals(X, TABLE_LEVEL))
+        shape = (len(temps), len(sals), len(columns))
+        values, conf, pred = (np.hstack([b[i] for b in blocks]).reshape(shape) for i in range(3))
+        return cls(models_dir, temp_grid, sal_grid, columns, values, fingerprint, conf, pred)
+
+    # ------------------ LOOKUP ------------------
+    @staticmethod
+    def _index(value, grid):
+        start, stop, step = grid
+        pos = (value - start) / step
+        i = int(round(pos))
+        if abs(pos - i) > 1e-6 or not 0 <= i <= round((stop - start) / step):
+            return None
+        return i
+
+    def _cell(self, temperature, salinity):
+        i = self._index(temperature, self.temp_grid)
+        j = self._index(salinity, self.sal_grid)
+        return None if i is None or j is None else (i, j)
+
+    def predict(self, group, name, temperature, salinity):
+        cell = self._cell(temperature, salinity)
+        if cell is None or (group, name) not in self._col:
+            return float(get_engine(self.models_dir).predict(group, name, [temperature, salinity])[0])
+        return float(self.values[cell][self._col[(group, name)]])
+
+    def compare(self, group, temperature, salinity, level=None):
+        """Same table as ``PredictionEngine.compare``, read from the grid when possible.
+
+        Interval bounds are read from the grid for the tabulated ``level``;
+        other levels come from the engine.
+        """
+        cell = self._cell(temperature, salinity)
+        tabulated = level is None or (self.conf is not None and np.isclose(level, self.level))
+        if cell is None or not tabulated:
+            return get_engine(self.models_dir).compare(group, [temperature, salinity], level)
+        idx = [i for i, c in enumerate(self.columns) if c[0] == group]
+        fit = self.values[cell][idx]
+        table = pd.DataFrame({"Category": [self.columns[i][1] for i in idx], "Predicted Count": fit})
+        if level is None:
+            return table
+        conf, pred = self.conf[cell][idx], self.pred[cell][idx]
+        return table.assign(**{"Confidence Low": fit - conf, "Confidence High": fit + conf,
+                               "Prediction Low": fit - pred, "Prediction High": fit + pred})
+
+    # ------------------ PERSISTENCE ------------------
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, temp_grid=self.temp_grid, sal_grid=self.sal_grid, values=self.values,
+                     conf=self.conf, pred=self.pred, level=self.level,
+                     columns=np.array(self.columns, dtype=str).reshape(-1, 2),
+                     fingerprint=self.fingerprint)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, models_dir, path):
+        with np.load(path) as saved:
+            intervals = "conf" in saved  # tables saved before intervals were tabulated have none
+            return cls(models_dir, saved["temp_grid"], saved["sal_grid"], saved["columns"].tolist(),
+                       saved["values"], str(saved["fingerprint"]),
+                       saved["conf"] if intervals else None, saved["pred"] if intervals else None,
+                       float(saved["level"]) if intervals else TABLE_LEVEL)
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_table(models_dir, temp_grid=TEMP_GRID, sal_grid=SAL_GRID):
+    """Shared table for ``models_dir`` and grid, reloaded or rebuilt when a model file changes."""
+    registry = get_registry(models_dir)
+    fingerprint = models_fingerprint(registry)
+    key = (os.path.abspath(models_dir), tuple(temp_grid), tuple(sal_grid))
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is not None and table.fingerprint == fingerprint:
+            return table
+        default_grid = tuple(temp_grid) == TEMP_GRID and tuple(sal_grid) == SAL_GRID
+        path = os.path.join(models_dir, TABLE_FILE) if default_grid else None
+        table = None
+        if path and os.path.exists(path):
+            table = PredictionTable.load(models_dir, path)
+            if table.fingerprint != fingerprint or table.conf is None:
+                table = None
+        if table is None:
+            table = PredictionTable.build(models_dir, temp_grid, sal_grid)
+            if path:
+                table.save(path)
+        _tables[key] = table
+        return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the slider-grid prediction table.")
+    parser.add_argument("--models-dir", default="models")
+    args = parser.parse_args()
+    table = get_table(args.models_dir)
+    print(f"✅ Prediction table {table.values.shape} in {os.path.join(args.models_dir, TABLE_FILE)}")
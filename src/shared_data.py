@@ -0,0 +1,306 @@
+"""Observation table and count models in shared memory for dashboard replicas.
+
+One publisher process loads the observation table (CSV or dataset store)
+and the model bundle and packs them into a single shared memory segment:
+a JSON manifest followed by one 64-byte aligned array per column (float32
+measures, int32 counts, category codes) and the bundle's coefficient and
+uncertainty rows. A small control segment names the current data
+segment; it is rewritten under a sequence counter (odd while writing) so
+readers never see a half-written name.
+
+Workers attach read-only: every column is a non-writeable numpy view of
+the segment, the DataFrame wraps those views without copying and the
+registry serves models straight from the shared coefficients, so a
+replica's own memory does not grow with the dataset. Each access checks
+the control sequence (one integer read); when the publisher swaps in a
+new version the worker attaches the new segment, and every later access
+unmaps old ones that nothing references any more.
+
+    python src/shared_data.py --data data/fish_data.store --models-dir models
+    SAGAR_SHARED=sagar streamlit run src/app2.py
+"""
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import read_table, source_version
+from model_bundle import N_UNCERTAINTY, ModelBundle, bundle_path
+from model_registry import ModelRegistry
+
+DEFAULT_NAME = "sagar"
+MAGIC = b"SAGARSH\0"
+_HEADER = struct.Struct("<8sI")  # magic, manifest length
+_CONTROL = struct.Struct("<8sQI")  # magic, sequence, payload length
+CONTROL_SIZE = 4096
+_ALIGN = 64
+
+
+def _attach(name):
+    """Open an existing segment without handing it to the resource tracker, which would unlink it at exit."""
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name)
+        if os.name == "posix":
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _code_dtype(n_categories):
+    # the dtype pandas itself picks for codes, so Categorical.from_codes does not copy them
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _pack_column(series):
+    """``(array, categories)``: float32 measures, int32 counts, string columns as category codes."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = [str(c) for c in series.cat.categories]
+        return series.cat.codes.to_numpy().astype(_code_dtype(len(categories))), categories
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return series.to_numpy(dtype=np.int32), None
+    if pd.api.types.is_float_dtype(series):
+        return series.to_numpy(dtype=np.float32), None
+    codes, categories = pd.factorize(series.astype(str), sort=True)
+    return codes.astype(_code_dtype(len(categories))), [str(c) for c in categories]
+
+
+# ------------------ PUBLISHER ------------------
+def build_segment(name, df, bundle, data_version):
+    """Write ``df`` and ``bundle`` into a new shared memory segment ``name``."""
+    arrays, manifest = [], {"data_version": data_version, "models_version": bundle.version,
+                            "rows": len(df), "columns": {}, "bundle": None}
+    for column in df.columns:
+        values, categories = _pack_column(df[column])
+        arrays.append((("columns", column), values))
+        manifest["columns"][column] = {"dtype": values.dtype.str, "categories": categories}
+    manifest["bundle"] = {"groups": bundle.groups, "version": bundle.version,
+                          "shape": list(np.shape(bundle.weights)),
+                          "uncertainty": bundle.uncertainty is not None}
+    arrays.append((("bundle", "weights"), np.asarray(bundle.weights, dtype="<f8")))
+    if bundle.uncertainty is not None:
+        arrays.append((("bundle", "uncertainty"), np.asarray(bundle.uncertainty, dtype="<f8")))
+    # offsets are relative to the aligned end of the manifest, so the manifest can hold them
+    offset = 0
+    for (section, key), values in arrays:
+        if section == "columns":
+            manifest["columns"][key]["offset"] = offset
+        else:
+            manifest["bundle"][f"{key}_offset"] = offset
+        offset += values.nbytes + (-values.nbytes % _ALIGN)
+    raw = json.dumps(manifest, ensure_ascii=False).encode()
+    start = _HEADER.size + len(raw)
+    start += -start % _ALIGN
+    shm = shared_memory.SharedMemory(name, create=True, size=max(start + offset, 1))
+    _HEADER.pack_into(shm.buf, 0, MAGIC, len(raw))
+    shm.buf[_HEADER.size:_HEADER.size + len(raw)] = raw
+    offset = start
+    for _, values in arrays:
+        np.ndarray(values.shape, values.dtype, buffer=shm.buf, offset=offset)[...] = values
+        offset += values.nbytes + (-values.nbytes % _ALIGN)
+    return shm
+
+
+class Control:
+    """The small segment naming the current data segment."""
+
+    def __init__(self, shm):
+        self.shm = shm
+
+    @classmethod
+    def create(cls, name):
+        try:
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name, create=True, size=CONTROL_SIZE)
+        _CONTROL.pack_into(shm.buf, 0, MAGIC, 0, 0)
+        return cls(shm)
+
+    def write(self, payload):
+        raw = json.dumps(payload).encode()
+        if _CONTROL.size + len(raw) > CONTROL_SIZE:
+            raise ValueError("Control payload too large")
+        _, seq, _ = _CONTROL.unpack_from(self.shm.buf, 0)
+        _CONTROL.pack_into(self.shm.buf, 0, MAGIC, seq + 1, 0)  # odd: being written
+        self.shm.buf[_CONTROL.size:_CONTROL.size + len(raw)] = raw
+        _CONTROL.pack_into(self.shm.buf, 0, MAGIC, seq + 2, len(raw))
+
+    def sequence(self):
+        return _CONTROL.unpack_from(self.shm.buf, 0)[1]
+
+    def read(self):
+        """``(sequence, payload)`` of a consistent write."""
+        while True:
+            magic, seq, length = _CONTROL.unpack_from(self.shm.buf, 0)
+            if magic != MAGIC:
+                raise ValueError("Not a shared data control segment")
+            if seq % 2 == 0:
+                raw = bytes(self.shm.buf[_CONTROL.size:_CONTROL.size + length])
+                if self.sequence() == seq:
+                    return seq, json.loads(raw) if length else None
+            time.sleep(0.0001)
+
+
+def publish(data_path, models_dir, name=DEFAULT_NAME, interval=5.0):
+    """Publish the table and models, then republish whenever either changes on disk."""
+    control = Control.create(name)
+    current, published, generation = None, None, 0
+    try:
+        while True:
+            data_version = source_version(data_path)
+            bundle = ModelBundle.load(bundle_path(models_dir))
+            if (data_version, bundle.version) != published:
+                generation += 1
+                segment = f"{name}_{os.getpid()}_{generation}"
+                shm = build_segment(segment, read_table(data_path), bundle, data_version)
+                control.write({"segment": segment, "data_version": data_version, "models_version": bundle.version})
+                if current is not None:
+                    # attached workers keep their mapping; the memory is freed when the last one lets go
+                    current.close()
+                    current.unlink()
+                current, published = shm, (data_version, bundle.version)
+                print(f"✅ Published {segment}: {shm.size / 2 ** 20:.1f} MiB, data {data_version[:12]}, "
+                      f"models {bundle.version[:12]}")
+            del bundle  # drop the file mapping between polls
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for shm in (current, control.shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+
+# ------------------ WORKERS ------------------
+class SharedSnapshot:
+    """Read-only views of one published segment."""
+
+    def __init__(self, shm, sequence):
+        self.shm = shm
+        self.sequence = sequence
+        magic, length = _HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{shm.name} is not a shared data segment")
+        manifest = json.loads(bytes(shm.buf[_HEADER.size:_HEADER.size + length]))
+        start = _HEADER.size + length
+        start += -start % _ALIGN
+        rows = manifest["rows"]
+        # Every view is based on ``raw``, so the segment is in use exactly while ``raw`` is alive.
+        # (numpy does not hold on to the buffer it was given, so shm.close() would not notice the views.)
+        raw = np.ndarray((shm.size,), np.uint8, buffer=shm.buf)
+        self.in_use = weakref.ref(raw)
+
+        def view(dtype, shape, offset):
+            dtype = np.dtype(dtype)
+            nbytes = int(np.prod(shape)) * dtype.itemsize
+            arr = raw[start + offset:start + offset + nbytes].view(dtype).reshape(shape)
+            arr.flags.writeable = False
+            return arr
+
+        data = {}
+        for column, col in manifest["columns"].items():
+            values = view(col["dtype"], (rows,), col["offset"])
+            data[column] = values if col["categories"] is None else pd.Categorical.from_codes(values, col["categories"])
+        self.frame = pd.DataFrame(data, copy=False)
+        spec = manifest["bundle"]
+        weights = view("<f8", tuple(spec["shape"]), spec["weights_offset"])
+        uncertainty = None
+        if spec["uncertainty"]:
+            uncertainty = view("<f8", (spec["shape"][0], N_UNCERTAINTY), spec["uncertainty_offset"])
+        self.bundle = ModelBundle(spec["groups"], weights, spec["version"], uncertainty)
+        self.data_version = manifest["data_version"]
+        self.models_version = manifest["models_version"]
+
+
+class SharedWorker:
+    """A replica's attachment to the published data; ``current()`` follows version swaps."""
+
+    def __init__(self, name=DEFAULT_NAME):
+        self.control = Control(_attach(name))
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._retired = []  # (segment, in_use) of snapshots swapped out, until nothing refers to them
+        self.swaps = 0
+
+    def current(self):
+        if self._retired and self._lock.acquire(blocking=False):
+            try:
+                self._release()  # frames from older snapshots may have been dropped since the last try
+            finally:
+                self._lock.release()
+        snapshot = self._snapshot
+        if snapshot is not None and self.control.sequence() == snapshot.sequence:
+            return snapshot
+        with self._lock:
+            while True:
+                seq, payload = self.control.read()
+                if self._snapshot is not None and seq == self._snapshot.sequence:
+                    return self._snapshot
+                if payload is None:
+                    raise RuntimeError("Nothing has been published yet")
+                try:
+                    shm = _attach(payload["segment"])
+                except FileNotFoundError:  # swapped again while we read the control segment
+                    continue
+                if self._snapshot is not None:
+                    self._retired.append((self._snapshot.shm, self._snapshot.in_use))
+                    self.swaps += 1
+                self._snapshot = SharedSnapshot(shm, seq)
+                self._release()
+                return self._snapshot
+
+    def _release(self):
+        """Unmap retired segments that no frame or array refers to any more."""
+        still = []
+        for shm, in_use in self._retired:
+            if in_use() is not None:
+                still.append((shm, in_use))
+                continue
+            try:
+                shm.close()
+            except BufferError:
+                still.append((shm, in_use))
+        self._retired = still
+
+    def registry(self, models_dir):
+        return SharedRegistry(models_dir, self)
+
+
+class SharedRegistry(ModelRegistry):
+    """Model registry reading the bundle from the published segment instead of the models directory."""
+
+    def __init__(self, models_dir, worker, max_models=64):
+        self.worker = worker
+        super().__init__(models_dir, max_models=max_models)
+
+    def _bundle_stat(self):
+        return self.worker.current().models_version
+
+    def _load_bundle(self):
+        return self.worker.current().bundle
+
+
+if __name__ == "__main__":
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Publish the observation table and models into shared memory.")
+    parser.add_argument("--data", default=os.path.join(repo_dir, "data", "fish_data.csv"),
+                        help="observation CSV or dataset store directory")
+    parser.add_argument("--models-dir", default=os.path.join(repo_dir, "models"))
+    parser.add_argument("--name", default=DEFAULT_NAME, help="name of the control segment workers attach to")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between checks for new data")
+    args = parser.parse_args()
+    publish(args.data, args.models_dir, args.name, args.interval)
@@ -0,0 +1,147 @@
+"""Vectorised fish size classification for whole catch records.
+
+Two classifiers share one output convention (int8 codes into
+``SIZE_LABELS``-style class lists):
+
+* ``classify_rules`` - the dashboard rule set (Small / Medium / Large) as
+  branch-free mask arithmetic.
+* ``CompiledTree`` - a trained ``DecisionTreeClassifier`` flattened into
+  threshold arrays. Because the tree splits only on length and weight, its
+  split thresholds cut the plane into a grid of cells with one class
+  each, so prediction is two bin lookups and a table gather.
+  Trees too large for a grid are walked one level at a time for all rows.
+  Neither path branches per row in Python.
+"""
+import numpy as np
+
+SIZE_LABELS = ["Small", "Medium", "Large"]
+FEATURES = ["Fish Length (cm)", "Weight (g)"]
+BLOCK = 1 << 16  # rows per block, keeps the working set in cache
+MAX_GRID_CELLS = 1 << 22
+MAX_COMPARE_CUTS = 32  # up to this many cuts, counting comparisons beats searchsorted
+
+
+def _float32_floor(values):
+    """Largest float32 <= each value, so ``x32 > cut`` gives the same answer in float32."""
+    down = np.asarray(values, dtype=np.float32)
+    above = down.astype(np.float64) > values
+    down[above] = np.nextafter(down[above], np.float32(-np.inf))
+    return down
+
+
+def _bin_index(x, cuts):
+    """Number of cuts strictly below each value (== searchsorted(cuts, x, "left"))."""
+    if len(cuts) > MAX_COMPARE_CUTS:
+        return np.searchsorted(cuts, x)
+    idx = np.zeros(len(x), dtype=np.uint8)
+    for cut in cuts:
+        idx += x > cut
+    return idx
+
+
+def classify_rules(length, weight, small=(15.0, 200.0), medium=(40.0, 1000.0)):
+    """Rule-set size codes: Small if length < 15 and weight < 200, Medium if < 40 and < 1000, else Large."""
+    length = np.asarray(length)
+    weight = np.asarray(weight)
+    is_small = (length < small[0]) & (weight < small[1])
+    is_medium = (length < medium[0]) & (weight < medium[1])
+    # small implies medium, so Large(2) - medium - small gives 0/1/2
+    return (2 - is_medium.view(np.int8) - is_small.view(np.int8)).astype(np.int8)
+
+
+class CompiledTree:
+    """A decision tree as flat node arrays.
+
+    Leaves point to themselves with an infinite threshold, so every row
+    can simply take ``max_depth`` steps.
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_class, classes, max_depth):
+        self.feature = np.asarray(feature, dtype=np.int8)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.leaf_class = np.asarray(leaf_class, dtype=np.int8)
+        self.classes = list(classes)
+        self.max_depth = int(max_depth)
+        self._build_grid()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        tree = model.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, np.inf, tree.threshold)
+        left = np.where(is_leaf, nodes, tree.children_left)
+        right = np.where(is_leaf, nodes, tree.children_right)
+        leaf_class = tree.value[:, 0, :].argmax(axis=1)
+        return cls(feature, threshold, left, right, leaf_class, [str(c) for c in model.classes_], tree.max_depth)
+
+    def _build_grid(self):
+        split = np.isfinite(self.threshold)
+        cuts = [np.unique(self.threshold[split & (self.feature == f)]) for f in range(len(FEATURES))]
+        self.cuts = [_float32_floor(c) for c in cuts]
+        if np.prod([len(c) + 1 for c in self.cuts]) > MAX_GRID_CELLS:
+            self.grid = None
+            return
+        # a cut goes left on value <= threshold, so each cut is its own cell's representative
+        length, weight = np.meshgrid(*[np.append(c, np.inf) for c in cuts], indexing="ij")
+        self.grid = self._walk(length.ravel(), weight.ravel())  # flat, row-major over (length cell, weight cell)
+        self._n_weight_cells = len(cuts[1]) + 1
+
+    def _walk(self, length, weight):
+        node = np.zeros(len(length), dtype=np.int32)
+        for _ in range(self.max_depth):
+            value = np.where(self.feature[node] == 0, length, weight)
+            go_left = value <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.leaf_class[node]
+
+    def predict_codes(self, length, weight):
+        """Class codes (indices into ``classes``) for arrays of lengths and weights."""
+        # sklearn compares float32 features against its thresholds
+        length = np.asarray(length, dtype=np.float32)
+        weight = np.asarray(weight, dtype=np.float32)
+        out = np.empty(len(length), dtype=np.int8)
+        for start in range(0, len(length), BLOCK):
+            stop = start + BLOCK
+            if self.grid is not None:
+                i = _bin_index(length[start:stop], self.cuts[0]).astype(np.intp)
+                j = _bin_index(weight[start:stop], self.cuts[1])
+                i *= self._n_weight_cells
+                i += j
+                out[start:stop] = self.grid.take(i)
+            else:
+                out[start:stop] = self._walk(length[start:stop], weight[start:stop])
+        return out
+
+    def predict(self, length, weight):
+        return np.asarray(self.classes, dtype=object)[self.predict_codes(length, weight)]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                     leaf_class=self.leaf_class, classes=np.array(self.classes, dtype=str),
+                     max_depth=self.max_depth)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["feature"], saved["threshold"], saved["left"], saved["right"],
+                       saved["leaf_class"], saved["classes"].tolist(), int(saved["max_depth"]))
+
+
+def train_tree(length, weight, labels, **kwargs):
+    """Fit a ``DecisionTreeClassifier`` on (length, weight) and compile it."""
+    from sklearn.tree import DecisionTreeClassifier  # only needed for training
+
+    model = DecisionTreeClassifier(**kwargs)
+    model.fit(np.column_stack([length, weight]), labels)
+    return CompiledTree.from_sklearn(model)
+
+
+def size_counts(df):
+    """Number of fish per rule-set size class in an observation table."""
+    codes = classify_rules(df[FEATURES[0]].to_numpy(), df[FEATURES[1]].to_numpy())
+    return dict(zip(SIZE_LABELS, np.bincount(codes, minlength=len(SIZE_LABELS)).tolist()))
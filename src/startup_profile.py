@@ -0,0 +1,42 @@
+"""Per-page import and initialisation timings for the Streamlit dashboard.
+
+Streamlit re-executes ``app2.py`` on every interaction, so each page does
+its own heavy imports and data loading. ``StartupReport`` times those
+phases for the current rerun and remembers the first (cold) timing of
+each phase for the life of the process, so a page that suddenly pulls in
+an expensive dependency shows up in the report. Every measured phase is
+also a ``METRICS`` span labelled with its page.
+"""
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from metrics import METRICS
+
+_cold = {}  # (page, phase) -> seconds on the first run in this process
+
+
+class StartupReport:
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def measure(self, page, phase):
+        start = time.perf_counter()
+        try:
+            with METRICS.span(phase, module=page):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            key = (page, phase)
+            self.timings[key] = self.timings.get(key, 0.0) + elapsed
+            _cold.setdefault(key, elapsed)
+
+    def table(self):
+        """This rerun's timings next to the cold timings of every phase seen so far."""
+        rows = [{"page": page, "phase": phase,
+                 "this run (ms)": round(self.timings.get((page, phase), float("nan")) * 1000, 2),
+                 "first run (ms)": round(cold * 1000, 2)}
+                for (page, phase), cold in _cold.items()]
+        return pd.DataFrame(rows, columns=["page", "phase", "this run (ms)", "first run (ms)"])
@@ -0,0 +1,218 @@
+"""Pre-aggregated observation summaries per (species, region, length bin, weight bin).
+
+For every cell of those four dimensions the store keeps the row count and,
+per measure (Count, Temperature, Salinity, Length, Weight), the non-null
+count, sum, min and max, so means and any group-by or roll-up over the
+dimensions are answered from a few hundred cells instead of the raw rows.
+Length and weight use the model bins (``grouped_stats``); rows without a
+``Region`` column, or outside the bins, land in ``Unknown``. New rows fold
+in with ``update``, and ``cached_summary`` catches a saved summary up with
+only the rows appended to a dataset store since it was built.
+
+    summary = SummaryStore.from_frame(df)
+    summary.group_by(["species"], "Count", ["sum"])
+    summary.rollup(["region", "species"], "Count", ["mean"])
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+from grouped_stats import LENGTH_BINS, WEIGHT_BINS
+from model_registry import LENGTH_LABELS, WEIGHT_LABELS
+
+MEASURES = ["Count", "Temperature (°C)", "Salinity (PSU)", "Fish Length (cm)", "Weight (g)"]
+DIMENSIONS = ["species", "region", "length_bin", "weight_bin"]
+STATS = ["rows", "count", "sum", "mean", "min", "max"]
+UNKNOWN = "Unknown"
+ALL = "All"
+
+
+class SummaryStore:
+    def __init__(self, measures=MEASURES):
+        self.measures = list(measures)
+        self.labels = {
+            "species": [],
+            "region": [],
+            "length_bin": LENGTH_LABELS + [UNKNOWN],
+            "weight_bin": WEIGHT_LABELS + [UNKNOWN],
+        }
+        shape = tuple(len(self.labels[d]) for d in DIMENSIONS)
+        m = len(self.measures)
+        self.rows = np.zeros(shape, dtype=np.int64)  # observations per cell
+        self.counts = np.zeros((m, *shape), dtype=np.int64)  # non-null values per measure and cell
+        self.sums = np.zeros((m, *shape))
+        self.mins = np.full((m, *shape), np.inf)
+        self.maxs = np.full((m, *shape), -np.inf)
+        self.n_rows = 0
+        self.version = None
+
+    @classmethod
+    def from_frame(cls, df, version=None, measures=MEASURES):
+        summary = cls([m for m in measures if m in df.columns])
+        summary.update(df)
+        summary.version = version
+        return summary
+
+    # ------------------ UPDATE ------------------
+    def _extend(self, dim, values):
+        """Add unseen labels of ``dim`` and grow every array along its axis."""
+        new = sorted(set(pd.unique(values)) - set(self.labels[dim]))
+        if not new:
+            return
+        self.labels[dim] += new
+        axis = DIMENSIONS.index(dim)
+        for name, fill in (("rows", 0), ("counts", 0), ("sums", 0.0), ("mins", np.inf), ("maxs", -np.inf)):
+            arr = getattr(self, name)
+            ax = axis + arr.ndim - len(DIMENSIONS)
+            pad = list(arr.shape)
+            pad[ax] = len(new)
+            setattr(self, name, np.concatenate([arr, np.full(pad, fill, dtype=arr.dtype)], axis=ax))
+
+    def _codes(self, df):
+        n = len(df)
+        species = df["Species"].astype(str).to_numpy() if "Species" in df else np.full(n, UNKNOWN)
+        region = df["Region"].astype(str).to_numpy() if "Region" in df else np.full(n, UNKNOWN)
+        self._extend("species", species)
+        self._extend("region", region)
+        codes = [pd.Index(self.labels["species"]).get_indexer(species),
+                 pd.Index(self.labels["region"]).get_indexer(region)]
+        for column, bins, dim in (("Fish Length (cm)", LENGTH_BINS, "length_bin"),
+                                  ("Weight (g)", WEIGHT_BINS, "weight_bin")):
+            unknown = len(self.labels[dim]) - 1
+            if column in df:
+                code = pd.cut(df[column], bins=bins, labels=False, right=False).to_numpy()
+                codes.append(np.where(np.isnan(code), unknown, code).astype(np.intp))
+            else:
+                codes.append(np.full(n, unknown, dtype=np.intp))
+        return np.ravel_multi_index(codes, self.rows.shape)
+
+    def update(self, df):
+        """Fold new observations into the summary."""
+        if len(df) == 0:
+            return self
+        flat = self._codes(df)
+        size = self.rows.size
+        self.rows += np.bincount(flat, minlength=size).reshape(self.rows.shape)
+        order = np.argsort(flat, kind="stable")
+        cells, starts = np.unique(flat[order], return_index=True)
+        for i, measure in enumerate(self.measures):
+            values = df[measure].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            self.counts[i] += np.bincount(flat, weights=present, minlength=size).astype(np.int64).reshape(self.rows.shape)
+            self.sums[i] += np.bincount(flat, weights=np.where(present, values, 0.0), minlength=size).reshape(self.rows.shape)
+            ordered = values[order]
+            mins, maxs = self.mins[i].reshape(-1), self.maxs[i].reshape(-1)  # views
+            mins[cells] = np.fmin(mins[cells], np.fmin.reduceat(ordered, starts))
+            maxs[cells] = np.fmax(maxs[cells], np.fmax.reduceat(ordered, starts))
+        self.n_rows += len(df)
+        return self
+
+    # ------------------ QUERIES ------------------
+    def _select(self, where):
+        """Index arrays per dimension for a ``{dimension: label or labels}`` filter."""
+        index = []
+        for dim in DIMENSIONS:
+            wanted = (where or {}).get(dim)
+            if wanted is None:
+                index.append(np.arange(len(self.labels[dim])))
+                continue
+            wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+            index.append(np.array([self.labels[dim].index(w) for w in wanted if w in self.labels[dim]], dtype=np.intp))
+        return np.ix_(*index), [np.asarray(self.labels[d], dtype=object)[i] for d, i in zip(DIMENSIONS, index)]
+
+    def group_by(self, by, measure="Count", stats=("sum", "count", "mean"), where=None):
+        """Statistics of ``measure`` per combination of the ``by`` dimensions.
+
+        ``where`` restricts any dimension to one label or a list of labels.
+        Combinations without observations are left out.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = [d for d in by if d not in DIMENSIONS] + [s for s in stats if s not in STATS]
+        if unknown:
+            raise ValueError(f"Unknown dimensions or statistics: {unknown}")
+        m = self.measures.index(measure)
+        cells, labels = self._select(where)
+        other = tuple(i for i, d in enumerate(DIMENSIONS) if d not in by)
+        keep = [DIMENSIONS.index(d) for d in by]
+
+        def reduce(arr, fn, **kwargs):
+            return np.transpose(fn(arr[cells], axis=other, keepdims=True, **kwargs), keep + list(other)).reshape(-1)
+
+        rows = reduce(self.rows, np.sum)
+        counts = reduce(self.counts[m], np.sum)
+        sums = reduce(self.sums[m], np.sum)
+        columns = {"rows": rows, "count": counts, "sum": sums}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            columns["mean"] = np.where(counts > 0, sums / counts, np.nan)
+        if "min" in stats:
+            columns["min"] = np.where(counts > 0, reduce(self.mins[m], np.min, initial=np.inf), np.nan)
+        if "max" in stats:
+            columns["max"] = np.where(counts > 0, reduce(self.maxs[m], np.max, initial=-np.inf), np.nan)
+        if by:
+            index = pd.MultiIndex.from_product([labels[i] for i in keep], names=by)
+            if len(by) == 1:
+                index = index.get_level_values(0)
+        else:
+            index = pd.Index([ALL], name="total")
+        table = pd.DataFrame({s: columns[s] for s in stats}, index=index)
+        return table[rows > 0]
+
+    def rollup(self, by, measure="Count", stats=("sum", "count", "mean"), where=None):
+        """``group_by`` for every prefix of ``by`` down to the grand total, with ``All`` in rolled-up levels."""
+        by = [by] if isinstance(by, str) else list(by)
+        parts = []
+        for depth in range(len(by), -1, -1):
+            part = self.group_by(by[:depth], measure, stats, where).reset_index()
+            part = part.drop(columns=["total"], errors="ignore")
+            for dim in by[depth:]:
+                part[dim] = ALL
+            parts.append(part[by + list(stats)])
+        return pd.concat(parts, ignore_index=True).set_index(by)
+
+    # ------------------ PERSISTENCE ------------------
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, measures=np.array(self.measures, dtype=str),
+                     species=np.array(self.labels["species"], dtype=str),
+                     region=np.array(self.labels["region"], dtype=str),
+                     rows=self.rows, counts=self.counts, sums=self.sums, mins=self.mins, maxs=self.maxs,
+                     n_rows=self.n_rows, version=str(self.version or ""))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            summary = cls(saved["measures"].tolist())
+            summary.labels["species"] = saved["species"].tolist()
+            summary.labels["region"] = saved["region"].tolist()
+            summary.rows, summary.counts, summary.sums = saved["rows"], saved["counts"], saved["sums"]
+            summary.mins, summary.maxs = saved["mins"], saved["maxs"]
+            summary.n_rows = int(saved["n_rows"])
+            summary.version = str(saved["version"]) or None
+        return summary
+
+
+def cached_summary(df, version, path=None, store_dir=None):
+    """The summary saved at ``path`` brought up to ``version``.
+
+    When ``df`` is a dataset store that has only grown since the summary
+    was saved, just the appended rows are folded in; otherwise the
+    summary is rebuilt from ``df``.
+    """
+    summary = SummaryStore.load(path) if path and version and os.path.exists(path) else None
+    if summary is not None and summary.version == version:
+        return summary
+    if summary is not None and store_dir and summary.version:
+        start = dataset_store.rows_at_version(store_dir, summary.version)
+        if start is not None and start == summary.n_rows:
+            summary.update(df.iloc[start:])
+            summary.version = version
+            summary.save(path)
+            return summary
+    summary = SummaryStore.from_frame(df, version=version)
+    if path and version:
+        summary.save(path)
+    return summary
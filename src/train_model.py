@@ -1,75 +1,243 @@
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-import joblib
+"""Train the fish count models into the model bundle.
+
+Every model partition (the general model, each species, each length and
+weight bin) is keyed by a hash of its input rows and the training
+parameters, recorded in ``build_manifest.json`` in the models directory.
+A rebuild only fits the partitions whose hash changed (across a process
+pool when asked to and there are enough rows to pay for it), and returns
+straight away when the source data has not changed at all since the last
+build.
+
+Rows folded in with ``--update`` are not part of the source data, so
+their statistics are kept in the build manifest and added to every
+partition a later rebuild refits; retraining never drops them.
+
+    python src/train_model.py --data data/fish_data.csv --models-dir models --jobs 4
+    python src/train_model.py --update new_rows.csv
+"""
+import argparse
+import hashlib
+import json
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import read_table, source_version
+from grouped_stats import GROUPS, LENGTH_BINS, TARGET, WEIGHT_BINS, SufficientStats, compute_group_stats, group_codes
+from model_bundle import ModelBundle, bundle_path
+from model_registry import MODEL_GROUPS, ModelRegistry
+from predict_engine import FEATURES
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.environ.get("SAGAR_DATA_PATH", os.path.join(REPO_DIR, "data", "fish_data.csv"))
+MODELS_DIR = os.environ.get("SAGAR_MODELS_DIR", os.path.join(REPO_DIR, "models"))
+BUILD_MANIFEST = "build_manifest.json"
+POOL_MIN_ROWS = 200_000  # below this, fitting in-process beats starting workers
+# Everything besides the rows that a fitted model depends on; changing any of it refits every partition.
+PARAMS = {"features": FEATURES, "target": TARGET, "length_bins": LENGTH_BINS, "weight_bins": WEIGHT_BINS,
+          "fit_intercept": True}
+
+
+def publish(group_stats, models_dir):
+    """Solve every model into the bundle and save the statistics it was solved from.
+
+    Models that are not in ``group_stats`` keep their current coefficients,
+    read from the existing bundle or from the older ``.pkl`` layout. The
+    existing bundle is read into memory, not mapped, so nothing here holds
+    the file that is about to be replaced (which Windows would refuse).
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    for group, stats in group_stats.items():
+        stats.save(models_dir, group)
+        for name, n in zip(stats.names, stats.n):
+            if n > 0:
+                print(f"✅ Model trained for {group} '{name}'")
+    if os.path.exists(bundle_path(models_dir)):
+        bundle = ModelBundle.load(bundle_path(models_dir), mmap=False)
+    else:
+        legacy = ModelRegistry(models_dir, use_bundle=False)
+        bundle = ModelBundle.from_models({group: legacy.get_group(group) for group in MODEL_GROUPS})
+    # the solved models carry residual variance and (XᵀX)⁻¹ for interval predictions
+    bundle = bundle.merged(ModelBundle.from_stats(group_stats))
+    bundle.save(bundle_path(models_dir))
+    print(f"✅ {len(bundle.weights)} models saved to {bundle_path(models_dir)} (version {bundle.version[:12]})")
+
+
+# ------------------ BUILD CACHE ------------------
+def params_hash():
+    return hashlib.sha1(json.dumps(PARAMS, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def read_build_manifest(models_dir):
+    path = os.path.join(models_dir, BUILD_MANIFEST)
+    if not os.path.exists(path):
+        return {"source": None, "params": None, "partitions": {}, "appended": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_build_manifest(models_dir, manifest):
+    os.makedirs(models_dir, exist_ok=True)
+    path = os.path.join(models_dir, BUILD_MANIFEST)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def appended_stats(manifest):
+    """``{group: SufficientStats}`` of the rows folded in with ``update``."""
+    by_group = {}
+    for key, saved in manifest.get("appended", {}).items():
+        group, name = key.split("/", 1)
+        by_group.setdefault(group, []).append((name, saved))
+    return {group: SufficientStats([name for name, _ in items], *[[saved[field] for _, saved in items]
+                                                                  for field in ("xtx", "xty", "yty", "n")])
+            for group, items in by_group.items()}
+
+
+def _record_appended(manifest, group_stats):
+    for group, stats in group_stats.items():
+        for k, name in enumerate(stats.names):
+            if stats.n[k] > 0:
+                manifest["appended"][f"{group}/{name}"] = {
+                    "xtx": stats.xtx[k].tolist(), "xty": stats.xty[k].tolist(),
+                    "yty": float(stats.yty[k]), "n": int(stats.n[k])}
+
+
+def partitions(df):
+    """Yield ``(group, name, X, y)`` for every non-empty model partition, rows in file order."""
+    X = np.ascontiguousarray(df[FEATURES].to_numpy(dtype=np.float64))
+    y = np.ascontiguousarray(df[TARGET].to_numpy(dtype=np.float64))
+    for group in GROUPS:
+        codes, names = group_codes(df, group)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        for k, name in enumerate(names):
+            rows = order[bounds[k]:bounds[k + 1]]
+            if len(rows):
+                yield group, name, X[rows], y[rows]
+
+
+def partition_hash(params, X, y):
+    digest = hashlib.sha1(params.encode())
+    digest.update(X.tobytes())
+    digest.update(y.tobytes())
+    return digest.hexdigest()
+
+
+def _fit_partition(group, name, X, y):
+    return group, SufficientStats.from_arrays(X, y, np.zeros(len(y), dtype=np.intp), [name])
+
+
+def fit_partitions(stale, jobs=1):
+    """``SufficientStats`` per group for the ``(group, name, X, y)`` partitions in ``stale``."""
+    fitted = {}
+
+    def add(group, stats):
+        fitted[group] = fitted[group].merge(stats) if group in fitted else stats
+
+    if jobs <= 1 or len(stale) <= 1 or sum(len(y) for _, _, _, y in stale) < POOL_MIN_ROWS:
+        for part in stale:
+            add(*_fit_partition(*part))
+        return fitted
+    # keep at most two partitions per worker in flight so memory stays bounded
+    with ProcessPoolExecutor(jobs) as pool:
+        pending = deque()
+        for part in stale:
+            pending.append(pool.submit(_fit_partition, *part))
+            if len(pending) >= 2 * jobs:
+                add(*pending.popleft().result())
+        while pending:
+            add(*pending.popleft().result())
+    return fitted
+
+
+def train(data_path, models_dir, jobs=1, force=False):
+    """Refit the partitions whose rows or parameters changed since the last build.
+
+    Returns the number of partitions fitted.
+    """
+    manifest = read_build_manifest(models_dir)
+    params = params_hash()
+    source = source_version(data_path)
+    built = os.path.exists(bundle_path(models_dir))
+    if not force and built and manifest["params"] == params and manifest["source"] == source:
+        print(f"✅ Models in {models_dir} are up to date with {data_path}")
+        return 0
+    # only the names are needed; keeping the bundle mapped would block replacing it on Windows
+    known = ModelBundle.load(bundle_path(models_dir), mmap=False).groups if built and not force else None
+    hashes = dict(manifest["partitions"]) if manifest["params"] == params and not force else {}
+    stale = []
+    for group, name, X, y in partitions(read_table(data_path)):
+        key = f"{group}/{name}"
+        digest = partition_hash(params, X, y)
+        if hashes.get(key) != digest or known is None or name not in known.get(group, []):
+            stale.append((group, name, X, y))
+        hashes[key] = digest
+    fitted = fit_partitions(stale, jobs)
+    # rows added with update() go into every refitted partition, and alone into partitions the data lacks
+    refitted = {(group, name) for group, name, _, _ in stale}
+    for group, extra in appended_stats(manifest).items():
+        names = [name for name in extra.names if (group, name) in refitted or (
+            f"{group}/{name}" not in hashes and (known is None or name not in known.get(group, [])))]
+        if names:
+            fitted[group] = fitted[group].merge(extra.select(names)) if group in fitted else extra.select(names)
+    if fitted:
+        publish(fitted, models_dir)
+    print(f"✅ {len(stale)} of {len(hashes)} partitions refitted")
+    write_build_manifest(models_dir, {"source": source, "params": params, "partitions": hashes,
+                                      "appended": manifest.get("appended", {})})
+    return len(stale)
+
+
+def update(new_data_path, models_dir, chunk_size=500_000):
+    """Fold only the new rows into the stored statistics and republish the affected models."""
+    stored = {group: SufficientStats.load(models_dir, group) for group in GROUPS}
+    if stored["general"].n.sum() == 0:
+        raise SystemExit(f"No stored statistics in {models_dir}; run a full training first.")
+    added = {}
+    for chunk in pd.read_csv(new_data_path, chunksize=chunk_size):
+        for group, stats in compute_group_stats(chunk).items():
+            added[group] = added[group].merge(stats) if group in added else stats
+    if not added:
+        print("Nothing to update: no new rows.")
+        return
+    touched = {}
+    for group, new in added.items():
+        names = [name for name, n in zip(new.names, new.n) if n > 0]
+        touched[group] = stored[group].merge(new).select(names)
+    publish(touched, models_dir)
+    # the published models no longer match the hashed rows, so the next train rechecks them,
+    # adding back the appended rows it cannot find in the source data
+    manifest = read_build_manifest(models_dir)
+    manifest["source"] = None
+    appended = appended_stats(manifest)
+    manifest["appended"] = {}
+    _record_appended(manifest, {group: appended[group].merge(new) if group in appended else new
+                                for group, new in added.items()})
+    _record_appended(manifest, {group: stats for group, stats in appended.items() if group not in added})
+    for group, stats in touched.items():
+        for name in stats.names:
+            manifest["partitions"].pop(f"{group}/{name}", None)
+    write_build_manifest(models_dir, manifest)
+
 
-# Load dataset
-df = pd.read_csv(r"C:\Users\aa\Desktop\Coding\sih-marine-prototype\data\fish_data.csv")
-
-# General model (keep this)
-X = df[["Temperature (°C)", "Salinity (PSU)"]]
-y = df["Count"]
-model = LinearRegression()
-model.fit(X, y)
-joblib.dump(model, r"C:\Users\aa\Desktop\Coding\sih-marine-prototype\models\fish_count_model.pkl")
-print("✅ General model trained and saved as models/fish_count_model.pkl")
-
-# Per-species models
-species_list = df["Species"].unique()
-per_species_dir = r"C:\Users\aa\Desktop\Coding\sih-marine-prototype\models\per_species"
-os.makedirs(per_species_dir, exist_ok=True)
-
-for species in species_list:
-    df_species = df[df["Species"] == species]
-    X_species = df_species[["Temperature (°C)", "Salinity (PSU)"]]
-    y_species = df_species["Count"]
-    model_species = LinearRegression()
-    model_species.fit(X_species, y_species)
-    model_path = os.path.join(per_species_dir, f"fish_count_model_{species}.pkl")
-    joblib.dump(model_species, model_path)
-    print(f"✅ Model trained and saved for {species}: {model_path}")
-
-    # ...existing code...
-
-# Define bins and labels
-length_bins = [0, 20, 40, float('inf')]
-length_labels = ['short', 'medium', 'long']
-weight_bins = [0, 500, 2000, float('inf')]
-weight_labels = ['light', 'medium', 'heavy']
-
-# Add columns for categories
-df['LengthCategory'] = pd.cut(df['Fish Length (cm)'], bins=length_bins, labels=length_labels, right=False)
-df['WeightCategory'] = pd.cut(df['Weight (g)'], bins=weight_bins, labels=weight_labels, right=False)
-
-# Per-length models
-per_length_dir = r"C:\Users\aa\Desktop\Coding\sih-marine-prototype\models\per_length"
-os.makedirs(per_length_dir, exist_ok=True)
-
-for length in length_labels:
-    df_length = df[df['LengthCategory'] == length]
-    if df_length.empty:
-        continue
-    X_length = df_length[["Temperature (°C)", "Salinity (PSU)"]]
-    y_length = df_length["Count"]
-    model_length = LinearRegression()
-    model_length.fit(X_length, y_length)
-    model_path = os.path.join(per_length_dir, f"fish_count_model_length_{length}.pkl")
-    joblib.dump(model_length, model_path)
-    print(f"✅ Model trained and saved for length '{length}': {model_path}")
-
-# Per-weight models
-per_weight_dir = r"C:\Users\aa\Desktop\Coding\sih-marine-prototype\models\per_weight"
-os.makedirs(per_weight_dir, exist_ok=True)
-
-for weight in weight_labels:
-    df_weight = df[df['WeightCategory'] == weight]
-    if df_weight.empty:
-        continue
-    X_weight = df_weight[["Temperature (°C)", "Salinity (PSU)"]]
-    y_weight = df_weight["Count"]
-    model_weight = LinearRegression()
-    model_weight.fit(X_weight, y_weight)
-    model_path = os.path.join(per_weight_dir, f"fish_count_model_weight_{weight}.pkl")
-    joblib.dump(model_weight, model_path)
-    print(f"✅ Model trained and saved for weight '{weight}': {model_path}")
-    
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the fish count models.")
+    parser.add_argument("--data", default=DATA_PATH, help="observation CSV or dataset store directory")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--update", metavar="NEW_CSV",
+                        help="fold the rows of NEW_CSV into the stored statistics instead of retraining")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    parser.add_argument("--jobs", type=int, default=1,
+                        help=f"worker processes for fitting (used once at least {POOL_MIN_ROWS} rows are refitted)")
+    parser.add_argument("--force", action="store_true", help="refit every partition, ignoring the build cache")
+    args = parser.parse_args()
+    if args.update:
+        update(args.update, args.models_dir, args.chunk_size)
+    else:
+        train(args.data, args.models_dir, args.jobs, args.force)
@@ -1,8 +1,18 @@
+import os
+import sys
+
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from dataset_store import source_version
+from summary_store import cached_summary
+
+# CSV to explore: first argument, default the repo's observation table
+csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fish_data.csv")
+
 try:
 	# Load the CSV file
-	df = pd.read_csv(r"C:\Users\aa\Desktop\Coding\csv\a.csv")
+	df = pd.read_csv(csv_path)
 except FileNotFoundError:
 	print("Error: The specified CSV file was not found.")
 	exit(1)
@@ -26,14 +36,22 @@ print(df.info())
 # Show statistics (mean, min, max)
 print("\nStatistics:\n", df.describe())
 
-print(df.groupby("Species")["Count"].sum())
-print(df.groupby("Region")["Count"].mean())
+# Group-by totals come from the persisted summary: the dataset store's when the CSV has one
+# (caught up with appended rows), otherwise one saved next to the CSV and reused until it changes
+store_dir = os.path.splitext(csv_path)[0] + ".store"
+if os.path.isdir(store_dir):
+	summary = cached_summary(df, source_version(store_dir), os.path.join(store_dir, "summary.npz"), store_dir)
+else:
+	summary = cached_summary(df, source_version(csv_path), os.path.splitext(csv_path)[0] + ".summary.npz")
+species_totals = summary.group_by("species", "Count", ["sum"])["sum"]
+print(species_totals)
+print(summary.group_by("region", "Count", ["mean"])["mean"])
 
 
 
 import matplotlib.pyplot as plt
 
-df.groupby("Species")["Count"].sum().plot(kind="bar", color="skyblue")
+species_totals.plot(kind="bar", color="skyblue")
 plt.title("Fish Count by Species")
 plt.ylabel("Total Count")
 plt.show()